@@ -0,0 +1,195 @@
+# コメント取得 → 返信生成 → 音声合成 → 再生 を asyncio のタスクでつなぐパイプライン。
+#
+# 各段階は上限つきの asyncio.Queue でつながっていて、再生中も次のコメントの
+# 返信生成・音声合成が進む。ブロッキングする処理（API 呼び出し・再生）は
+# asyncio.to_thread でスレッドに逃がす。
+#
+# 各段階の処理時間・キューの待ち時間は tracing.Tracer に記録する。視聴者がコメントを
+# 投稿した時刻（publishedAt）から読み上げ開始までは "published_to_speech" として記録する。
+import asyncio
+import pprint
+import time
+from datetime import datetime
+
+import tracing
+from comment_scheduler import build_prompt
+from sentence_splitter import split_sentences
+
+# 各段階の終わりを次の段階に伝える印
+_END = None
+
+
+def _published_time(message):
+    """YouTube の publishedAt（ISO 8601）を UNIX 時刻にする。ない場合は None。"""
+    published_at = (message or {}).get("published_at")
+    if not published_at:
+        return None
+    try:
+        return datetime.fromisoformat(published_at.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class AITuberPipeline:
+    """
+    コメント（非同期イテレータ）を受け取り、返信を生成して読み上げるパイプライン。
+
+    :param reply: コメント -> 返信テキスト（ブロッキング関数）
+    :param synthesize: テキスト -> 音声（ブロッキング関数）
+    :param play: 音声を再生し、終わるまで待つ（ブロッキング関数）
+    :param queue_size: 段階間のキューの上限
+    :param scheduler: comment_scheduler.CommentScheduler。指定した場合はコメントを
+                      まとめて優先度順に返信し、古いコメントは捨てる
+    :param stream: True の場合、reply はテキストの断片を返すイテレータ（gemini_api.stream_reply など）。
+                   文が1つ完成するごとに音声合成に渡す
+    :param tracer: 処理時間を記録する tracing.Tracer（省略時は tracing.tracer）
+    """
+
+    def __init__(self, reply, synthesize, play, queue_size=4, scheduler=None, stream=False, tracer=None):
+        self.reply = reply
+        self.stream = stream
+        self.synthesize = synthesize
+        self.play = play
+        self.queue_size = queue_size
+        self.scheduler = scheduler
+        self.stats = tracer or tracing.tracer
+        # received: 受け取ったコメント数、spoken: 返信を読み上げたコメント数（まとめたものも数える）
+        self.counts = {"received": 0, "spoken": 0}
+        self.errors = {"reply": 0, "synthesis": 0, "playback": 0}
+        # 実行中の段階間のキュー（負荷試験でキューの長さを見るため）
+        self.queues = {}
+
+    def _error(self, stage, item, error):
+        """1件の失敗でパイプライン全体を止めないように、記録してその件だけ飛ばす。"""
+        self.errors[stage] += 1
+        pprint.pprint(f"{stage} エラー: {error} ({item['comment']})")
+
+    async def _ingest(self, comments, out_queue):
+        async for comment in comments:
+            item = {"received_at": time.monotonic()}
+            self.counts["received"] += 1
+            # chat_ingest.LiveChatPoller のメッセージ（dict）と文字列の両方を受け付ける
+            if isinstance(comment, dict):
+                item["message"] = comment
+                item["published"] = _published_time(comment)
+                if item["published"] is not None:
+                    self.stats.record("published_to_ingest", time.time() - item["published"])
+                comment = comment["text"]
+            item["comment"] = comment
+            if self.scheduler is not None:
+                self.scheduler.add(comment, item, item["received_at"])
+            else:
+                await out_queue.put(item)
+        if self.scheduler is not None:
+            self.scheduler.close()
+        else:
+            await out_queue.put(_END)
+
+    async def _next_comment(self, in_queue):
+        if self.scheduler is None:
+            item = await in_queue.get()
+            if item is not _END:
+                item["prompt"] = item["comment"]
+            return item
+        batch = await self.scheduler.get_batch()
+        if batch is None:
+            return _END
+        items = [payload for group in batch for payload in group.payloads]
+        return {
+            "comment": " ".join(group.text for group in batch),
+            "prompt": build_prompt(batch),
+            "batch": items,
+            "received_at": min(payload["received_at"] for payload in items),
+            "published": min((payload["published"] for payload in items
+                              if payload.get("published") is not None), default=None),
+        }
+
+    async def _reply_stage(self, in_queue, out_queue):
+        while (item := await self._next_comment(in_queue)) is not _END:
+            start = time.monotonic()
+            self.stats.record("queue_wait.reply", start - item["received_at"])
+            # 文ごとに分けた item で共有し、最初に再生した文でだけ読み上げ済みにする
+            item["state"] = {"spoken": False}
+            if self.stream:
+                await self._stream_reply(item, start, out_queue)
+                continue
+            try:
+                item["reply"] = await asyncio.to_thread(self.reply, item["prompt"])
+            except Exception as e:
+                self._error("reply", item, e)
+                continue
+            item["speech"] = f"{item['comment']} {item['reply']}"
+            item["replied_at"] = time.monotonic()
+            self.stats.record("reply", item["replied_at"] - start)
+            await out_queue.put(item)
+        await out_queue.put(_END)
+
+    async def _stream_reply(self, item, start, out_queue):
+        sentences = split_sentences(self.reply(item["prompt"]))
+        part = 0
+        # 次の文ができるまでの待ち（通信）はスレッドで行う
+        while True:
+            try:
+                sentence = await asyncio.to_thread(next, sentences, None)
+            except Exception as e:
+                # 途中まで届いた文はそのまま読み上げる
+                self._error("reply", item, e)
+                return
+            if sentence is None:
+                break
+            now = time.monotonic()
+            if part == 0:
+                self.stats.record("reply.first_sentence", now - start)
+            speech = f"{item['comment']} {sentence}" if part == 0 else sentence
+            await out_queue.put({**item, "reply": sentence, "speech": speech, "part": part, "replied_at": now})
+            part += 1
+        self.stats.record("reply", time.monotonic() - start)
+
+    async def _synthesis_stage(self, in_queue, out_queue):
+        while (item := await in_queue.get()) is not _END:
+            start = time.monotonic()
+            self.stats.record("queue_wait.synthesis", start - item["replied_at"])
+            try:
+                item["voice"] = await asyncio.to_thread(self.synthesize, item["speech"])
+            except Exception as e:
+                self._error("synthesis", item, e)
+                continue
+            item["synthesized_at"] = time.monotonic()
+            self.stats.record("synthesis", item["synthesized_at"] - start)
+            await out_queue.put(item)
+        await out_queue.put(_END)
+
+    async def _playback_stage(self, in_queue):
+        while (item := await in_queue.get()) is not _END:
+            start = time.monotonic()
+            self.stats.record("queue_wait.playback", start - item["synthesized_at"])
+            if not item["state"]["spoken"]:
+                item["state"]["spoken"] = True
+                self.counts["spoken"] += len(item.get("batch", ())) or 1
+                self.stats.record("comment_to_speech", start - item["received_at"])
+                if item.get("published") is not None:
+                    self.stats.record("published_to_speech", time.time() - item["published"])
+                pprint.pprint(f"新しいコメント: {item['comment']}")
+            try:
+                await asyncio.to_thread(self.play, item["voice"])
+            except Exception as e:
+                self._error("playback", item, e)
+                continue
+            self.stats.record("playback", time.monotonic() - start)
+
+    async def run(self, comments):
+        """
+        comments が終わるまで（またはキャンセルされるまで）パイプラインを動かす。
+
+        :param comments: コメントを返す非同期イテレータ
+        """
+        comment_queue = asyncio.Queue(self.queue_size)
+        reply_queue = asyncio.Queue(self.queue_size)
+        voice_queue = asyncio.Queue(self.queue_size)
+        self.queues = {"comment": comment_queue, "reply": reply_queue, "voice": voice_queue}
+        await asyncio.gather(
+            self._ingest(comments, comment_queue),
+            self._reply_stage(comment_queue, reply_queue),
+            self._synthesis_stage(reply_queue, voice_queue),
+            self._playback_stage(voice_queue),
+        )
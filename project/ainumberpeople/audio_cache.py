@@ -0,0 +1,127 @@
+# VOICEVOX で合成した音声のキャッシュ。
+#
+# キーは (テキスト, 話者, 合成パラメータ) の SHA-256。同じ内容なら同じファイルになる。
+# - メモリ: 合計サイズ上限つきの LRU
+# - ディスク: material/voice_cache/<キーの先頭2文字>/<キー>.wav
+#
+# python audio_cache.py phrases.txt    1行1フレーズのファイルから事前に合成しておく
+import hashlib
+import json
+import os
+import pprint
+import sys
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "material", "voice_cache")
+MAX_MEMORY_BYTES = 64 * 1024 * 1024
+
+
+class AudioCache:
+    """
+    :param max_bytes: メモリに置く音声の合計サイズ上限（バイト）
+    :param directory: ディスクキャッシュの場所（None の場合はメモリのみ）
+    """
+
+    def __init__(self, max_bytes=MAX_MEMORY_BYTES, directory=CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._memory = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hit": 0, "disk_hit": 0, "miss": 0}
+
+    @staticmethod
+    def key(text, speaker, params=None):
+        source = json.dumps([text, speaker, params or {}], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.wav")
+
+    def _remember(self, key, voice):
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            if len(voice) > self.max_bytes:
+                return
+            self._memory[key] = voice
+            self._size += len(voice)
+            while self._size > self.max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get(self, key):
+        with self._lock:
+            voice = self._memory.get(key)
+            if voice is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hit"] += 1
+                return voice
+        if self.directory is not None:
+            try:
+                with open(self._path(key), "rb") as f:
+                    voice = f.read()
+            except OSError:
+                voice = None
+            if voice is not None:
+                self._remember(key, voice)
+                with self._lock:
+                    self.stats["disk_hit"] += 1
+                return voice
+        with self._lock:
+            self.stats["miss"] += 1
+        return None
+
+    def put(self, key, voice):
+        self._remember(key, voice)
+        if self.directory is not None:
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            # ディスクに書けなくても（容量不足・権限など）配信は止めず、メモリのキャッシュだけ使う
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    f.write(voice)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                pprint.pprint(f"音声キャッシュを保存できませんでした: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def get_or_synthesize(self, text, speaker, synthesize, params=None):
+        """
+        キャッシュにあればそれを返し、なければ synthesize(text, speaker) で合成して保存する。
+        """
+        key = self.key(text, speaker, params)
+        voice = self.get(key)
+        if voice is None:
+            voice = synthesize(text, speaker)
+            self.put(key, voice)
+        return voice
+
+    def prewarm(self, phrases, speaker, synthesize, params=None):
+        """よく使うフレーズを事前に合成しておく。合成したフレーズの数を返す。"""
+        count = 0
+        for phrase in phrases:
+            phrase = phrase.strip()
+            if phrase:
+                self.get_or_synthesize(phrase, speaker, synthesize, params)
+                count += 1
+        return count
+
+    def hit_rate(self):
+        with self._lock:
+            total = sum(self.stats.values())
+            return (self.stats["memory_hit"] + self.stats["disk_hit"]) / total if total else 0.0
+
+
+if __name__ == "__main__":
+    import sound_api
+
+    with open(sys.argv[1], encoding="utf-8") as f:
+        count = sound_api.audio_cache.prewarm(f, 3, sound_api.synthesize_voicevox)
+    print(f"{count} フレーズを合成しました: {sound_api.audio_cache.stats}")
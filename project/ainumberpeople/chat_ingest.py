@@ -0,0 +1,130 @@
+# YouTube ライブチャットのコメントを取りこぼさずに受け取るためのモジュール。
+#
+# - 1回のリクエストでページ全体（maxResults 2000）を取得する
+# - 次の取得までの間隔は API が返す pollingIntervalMillis に従う
+# - メッセージ ID で重複を取り除く
+# - 受け取ったコメントは上限つきのバッファに入れ、非同期イテレータとして返す。
+#   バッファがいっぱいの間は次の取得を行わない（API の割り当てを無駄にしない）
+# - 403 でも割り当て・レート制限の超過なら終了せず、間隔を空けて取得し直す
+import asyncio
+import pprint
+from collections import OrderedDict
+
+import requests
+
+import youtube_api
+
+# 403 でもチャットの終了ではなく、待てば再び取得できる理由（error.errors[0].reason）
+RETRY_REASONS = ("quotaExceeded", "rateLimitExceeded", "userRateLimitExceeded")
+
+
+def error_reason(response):
+    """YouTube Data API のエラーレスポンスから理由（例: "liveChatEnded"）を取り出す。"""
+    try:
+        return response.json()["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+class LiveChatPoller:
+    """
+    ライブチャットの新しいメッセージを順に返す非同期イテレータ。
+
+    async for message in LiveChatPoller(api_key, chat_id):
+        print(message["text"])
+
+    :param buffer_size: 受け取ったメッセージを溜めておく上限
+    :param min_interval: 取得間隔の下限（秒）
+    :param max_interval: エラーが続いたときの取得間隔の上限（秒）
+    :param seen_size: 重複判定のために覚えておくメッセージ ID の数
+    :param fetch: (api_key, chat_id, page_token) -> レスポンス（既定: youtube_api.get_chat_messages）
+    """
+
+    def __init__(self, api_key, chat_id, buffer_size=200, min_interval=1.0, max_interval=30.0,
+                 seen_size=10000, fetch=None):
+        self.api_key = api_key
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.seen_size = seen_size
+        self.fetch = fetch or youtube_api.get_chat_messages
+        self.buffer = asyncio.Queue(buffer_size)
+        self.page_token = None
+        self._seen = OrderedDict()
+        self._task = None
+        self._error = None
+        self.stats = {"polls": 0, "received": 0, "duplicates": 0, "errors": 0}
+
+    def _is_new(self, message_id):
+        if message_id in self._seen:
+            self.stats["duplicates"] += 1
+            return False
+        self._seen[message_id] = True
+        if len(self._seen) > self.seen_size:
+            self._seen.popitem(last=False)
+        return True
+
+    async def _poll(self):
+        try:
+            await self._poll_loop()
+        except Exception as e:
+            # 想定外のエラー（不正なレスポンスなど）で止まった場合も、イテレータが待ち続けないように知らせる
+            pprint.pprint(f"コメントの取得を中止しました: {e!r}")
+            self._error = e
+            await self.buffer.put(None)
+
+    async def _poll_loop(self):
+        interval = self.min_interval
+        while True:
+            try:
+                resource = await asyncio.to_thread(self.fetch, self.api_key, self.chat_id, self.page_token)
+            except requests.exceptions.RequestException as e:
+                # チャットが終了した・見つからない場合は終わる
+                if (e.response is not None and e.response.status_code in (403, 404)
+                        and error_reason(e.response) not in RETRY_REASONS):
+                    pprint.pprint(f"ライブチャットが終了しました: {e}")
+                    await self.buffer.put(None)
+                    return
+                self.stats["errors"] += 1
+                interval = min(interval * 2, self.max_interval)
+                pprint.pprint(f"コメント取得エラー: {e}")
+                await asyncio.sleep(interval)
+                continue
+
+            self.stats["polls"] += 1
+            self.page_token = resource.get("nextPageToken", self.page_token)
+            for item in resource.get("items", []):
+                if not self._is_new(item["id"]):
+                    continue
+                message = youtube_api.to_message(item)
+                if message is None:
+                    continue
+                self.stats["received"] += 1
+                # バッファがいっぱいなら空くまで待つ（その間は取得しない）
+                await self.buffer.put(message)
+
+            interval = max(self.min_interval, resource.get("pollingIntervalMillis", 0) / 1000)
+            await asyncio.sleep(interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def __aiter__(self):
+        self.start()
+        try:
+            while (message := await self.buffer.get()) is not None:
+                yield message
+            if self._error is not None:
+                raise self._error
+        finally:
+            await self.stop()
@@ -0,0 +1,155 @@
+# 返信する前にコメントを整理するスケジューラ。
+#
+# - 同じ・ほとんど同じコメント（「こんにちは」「こんにちは！」など）は1つにまとめ、件数を数える
+# - 件数・質問かどうか・古さからスコアを付け、スコアの高い順に返す
+# - max_age 秒より古いコメントは返信せずに捨てる
+# - 複数のコメントを1回の LLM 呼び出しでまとめて答えるためのプロンプトを作る
+import asyncio
+import difflib
+import time
+import unicodedata
+
+
+def normalize(text):
+    """比較用にコメントを正規化する（全角半角・大文字小文字・空白・記号・繰り返しを揃える）。"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    chars = []
+    for char in text:
+        if unicodedata.category(char)[0] in "PSZC":
+            continue
+        # 「ーーー」「wwww」などの繰り返しは2文字までにする
+        if len(chars) >= 2 and chars[-1] == char and chars[-2] == char:
+            continue
+        chars.append(char)
+    return "".join(chars)
+
+
+def is_question(text):
+    text = text.rstrip()
+    return text.endswith(("?", "？", "か", "の")) or "何" in text or "どこ" in text
+
+
+class CommentGroup:
+    """まとめられたコメント（同じ内容のコメントの集まり）。"""
+
+    def __init__(self, key, text, payload, received_at):
+        self.key = key
+        self.text = text
+        self.payloads = [payload]
+        self.first_at = received_at
+        self.question = is_question(text)
+
+    @property
+    def count(self):
+        return len(self.payloads)
+
+    def add(self, payload):
+        self.payloads.append(payload)
+
+    def score(self, now, max_age):
+        # 多くの人が書いたコメント・質問を優先し、古いものほど下げる
+        return self.count + (2 if self.question else 0) - (now - self.first_at) / max_age
+
+
+class CommentScheduler:
+    """
+    :param max_age: この秒数より古いコメントは捨てる
+    :param max_batch: 1回にまとめて返すコメント（グループ）の数
+    :param max_pending: 溜めておくグループ数の上限（超えたらスコアの低いものから捨てる）
+    :param similarity: この値以上に似ているコメントを同じグループにまとめる（0〜1）
+    """
+
+    def __init__(self, max_age=60, max_batch=5, max_pending=100, similarity=0.85, clock=time.monotonic):
+        self.max_age = max_age
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.similarity = similarity
+        self.clock = clock
+        self._groups = {}
+        self._closed = False
+        self._event = asyncio.Event()
+        self.stats = {"received": 0, "merged": 0, "expired": 0, "evicted": 0, "batches": 0}
+
+    def __len__(self):
+        return len(self._groups)
+
+    def _find_group(self, key):
+        group = self._groups.get(key)
+        if group is not None or self.similarity >= 1:
+            return group
+        for group in self._groups.values():
+            matcher = difflib.SequenceMatcher(None, key, group.key)
+            if matcher.real_quick_ratio() >= self.similarity and matcher.ratio() >= self.similarity:
+                return group
+        return None
+
+    def add(self, text, payload=None, received_at=None):
+        """
+        コメントを追加する。
+
+        :param text: コメント本文
+        :param payload: バッチと一緒に返す任意のデータ（既定: text）
+        """
+        now = self.clock() if received_at is None else received_at
+        self.stats["received"] += 1
+        key = normalize(text) or text
+        group = self._find_group(key)
+        if group is not None:
+            group.add(text if payload is None else payload)
+            self.stats["merged"] += 1
+        else:
+            self._groups[key] = CommentGroup(key, text, text if payload is None else payload, now)
+            if len(self._groups) > self.max_pending:
+                worst = min(self._groups.values(), key=lambda g: g.score(now, self.max_age))
+                del self._groups[worst.key]
+                self.stats["evicted"] += worst.count
+        self._event.set()
+
+    def _drop_expired(self, now):
+        for key in [key for key, group in self._groups.items() if now - group.first_at > self.max_age]:
+            self.stats["expired"] += self._groups.pop(key).count
+
+    def next_batch(self):
+        """
+        スコアの高い順に最大 max_batch 件のグループを取り出す。ない場合は空のリスト。
+        """
+        now = self.clock()
+        self._drop_expired(now)
+        groups = sorted(self._groups.values(), key=lambda g: g.score(now, self.max_age), reverse=True)
+        batch = groups[:self.max_batch]
+        for group in batch:
+            del self._groups[group.key]
+        if not self._groups:
+            self._event.clear()
+        if batch:
+            self.stats["batches"] += 1
+        return batch
+
+    async def get_batch(self):
+        """
+        コメントが届くまで待ってからバッチを返す。close() 後にコメントがなくなったら None。
+        """
+        while True:
+            batch = self.next_batch()
+            if batch:
+                return batch
+            if self._closed:
+                return None
+            await self._event.wait()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+
+def build_prompt(batch):
+    """
+    バッチから LLM に渡すプロンプトを作る。コメントが1つの場合はその本文をそのまま返す。
+    """
+    if len(batch) == 1:
+        return batch[0].text
+    lines = ["視聴者から次のコメントが届きました。配信者として、それぞれに短く答えてください。"]
+    for i, group in enumerate(batch, 1):
+        count = f"（{group.count}人）" if group.count > 1 else ""
+        lines.append(f"{i}. {group.text}{count}")
+    return "\n".join(lines)
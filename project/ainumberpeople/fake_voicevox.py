@@ -0,0 +1,121 @@
+# テスト・ベンチマーク用の VOICEVOX の代わりになるローカルサーバー。
+# /audio_query と /synthesis だけに対応し、テキストの長さに応じた長さのサイン波（WAV）を返す。
+#
+# python fake_voicevox.py [--port 50021] [--latency 0.2] [--error-rate 0.0]
+import argparse
+import io
+import json
+import math
+import random
+import struct
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SAMPLE_RATE = 24000
+
+
+def make_wav(text, seconds_per_char=0.01, frequency=440):
+    """テキスト1文字あたり seconds_per_char 秒のサイン波の WAV（16bit モノラル）を作る。"""
+    frames = int(SAMPLE_RATE * seconds_per_char * max(len(text), 1))
+    samples = (int(8000 * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE)) for i in range(frames))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(struct.pack(f"<{frames}h", *samples))
+    return buffer.getvalue()
+
+
+class FakeVoicevoxServer:
+    """
+    :param latency: /synthesis の応答までの時間（秒）。/audio_query はその 1/10
+    :param char_latency: /synthesis でテキスト1文字ごとに加える時間（秒）
+    :param error_rate: 500 エラーを返す割合（0〜1）
+    :param port: 0 の場合は空いているポートを使う
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, port=0, seed=0, seconds_per_char=0.01,
+                 char_latency=0.0):
+        self.latency = latency
+        self.char_latency = char_latency
+        self.error_rate = error_rate
+        self.seconds_per_char = seconds_per_char
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"audio_query": 0, "synthesis": 0, "error": 0}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, body=b"", content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if url.path not in ("/audio_query", "/synthesis"):
+                    self._send(404)
+                    return
+                with fake._lock:
+                    fake.stats[url.path[1:]] += 1
+                    failed = fake._random.random() < fake.error_rate
+                    if failed:
+                        fake.stats["error"] += 1
+                if url.path == "/audio_query":
+                    time.sleep(fake.latency / 10)
+                else:
+                    text = json.loads(body or b"{}").get("kana", "")
+                    time.sleep(fake.latency + fake.char_latency * len(text))
+                if failed:
+                    self._send(500, b'{"detail": "fake error"}')
+                elif url.path == "/audio_query":
+                    text = query.get("text", [""])[0]
+                    audio_query = {"kana": text, "speedScale": 1.0, "pitchScale": 0.0,
+                                   "outputSamplingRate": SAMPLE_RATE, "accent_phrases": []}
+                    self._send(200, json.dumps(audio_query, ensure_ascii=False).encode("utf-8"))
+                else:
+                    self._send(200, make_wav(text, fake.seconds_per_char), "audio/wav")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VOICEVOX の代わりになるローカルサーバー")
+    parser.add_argument("--port", type=int, default=50021)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--char-latency", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeVoicevoxServer(args.latency, args.error_rate, args.port, char_latency=args.char_latency)
+    print(f"fake VOICEVOX: {server.url}")
+    server.server.serve_forever()
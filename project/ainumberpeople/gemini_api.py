@@ -1,20 +1,27 @@
 # pip install -q -U google-genai
-from google import genai
 import os
 from dotenv import load_dotenv
 
+import tracing
+from reply_engine import GeminiEngine
+
 
 load_dotenv()
 
-GEMINI_API_KEY= os.getenv('GEMINI_API_KEY')
-client = genai.Client(api_key=GEMINI_API_KEY)
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', "gemini-2.0-flash")
+# クライアントは最初に使うときに作る（reply_engine.GeminiEngine を参照）
+engine = GeminiEngine(model=GEMINI_MODEL)
 
 
+@tracing.traced("llm.get_reply")
 def getReply(message):
-    response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=message)
-    return response.text
+    return engine.reply(message)
+
+
+def stream_reply(message):
+    """返信を少しずつ（届いた順に）返すジェネレータ。"""
+    yield from engine.stream(message)
 
 if __name__ == "__main__":
     result= getReply(message="good day")
-    print(result)
\ No newline at end of file
+    print(result)
@@ -0,0 +1,334 @@
+# YouTube・LLM・VOICEVOX を使わずにパイプライン全体に負荷をかける試験。
+#
+# - YouTube: 記録したチャット（または生成したチャット）を speed 倍の速さで返す偽サーバー
+# - LLM: reply_engine.StubEngine
+# - VOICEVOX: fake_voicevox.FakeVoicevoxServer
+# - 再生: 音声の長さだけ待つ（sounddevice を使わない）
+# それぞれに遅延とエラー率を設定でき、処理できたコメント数・捨てたコメント数・
+# キューの長さ・遅延（p50/p95/p99）を表示する。
+#
+# python loadtest.py run --speed 10                       生成したチャットで試験
+# python loadtest.py run --recording chat.jsonl --speed 50 記録したチャットで試験
+# python loadtest.py record <chat_id> chat.jsonl          配信中のチャットを記録（Ctrl+C で終了）
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import pprint
+import random
+import threading
+import time
+import wave
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import tracing
+import youtube_api
+from aituber_pipeline import AITuberPipeline
+from chat_ingest import LiveChatPoller
+from comment_scheduler import CommentScheduler
+from fake_voicevox import FakeVoicevoxServer
+from reply_engine import FallbackEngine, StubEngine
+from voicevox_client import VoicevoxClient
+
+SAMPLE_COMMENTS = ["こんにちは", "初見です", "今日は何するの？", "かわいい", "おはようございます",
+                   "草", "今、何歳ですか", "どこに住んでるの？", "綺麗", "今日　天気がいいね",
+                   "好きな食べ物は何ですか？", "こんばんは！", "がんばって", "888888"]
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def load_recording(path):
+    """
+    記録したチャット（1行に liveChatMessage 1件、または API のレスポンス1ページ）を読み込む。
+
+    :return: [(最初のコメントからの秒数, liveChatMessage), ...]
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                resource = json.loads(line)
+                items.extend(resource.get("items", [resource]))
+    items.sort(key=lambda item: item["snippet"]["publishedAt"])
+    if not items:
+        return []
+    first = _parse_time(items[0]["snippet"]["publishedAt"])
+    return [(_parse_time(item["snippet"]["publishedAt"]) - first, item) for item in items]
+
+
+def synthetic_chat(count=200, rate=1.0, seed=0):
+    """
+    1秒あたり平均 rate 件（ポアソン到着）のチャットを作る。同じコメントも混ざる。
+
+    :return: [(最初のコメントからの秒数, liveChatMessage), ...]
+    """
+    rand = random.Random(seed)
+    offset = 0.0
+    messages = []
+    for i in range(count):
+        text = rand.choice(SAMPLE_COMMENTS)
+        messages.append((offset, {
+            "id": f"fake-{i}",
+            "snippet": {"type": "textMessageEvent", "displayMessage": text,
+                        "textMessageDetails": {"messageText": text}},
+            "authorDetails": {"displayName": f"viewer{rand.randrange(50)}"},
+        }))
+        offset += rand.expovariate(rate)
+    return messages
+
+
+class FakeYouTubeServer:
+    """
+    liveChat/messages だけに対応した YouTube Data API の代わり。
+    start() してからの経過時間の speed 倍までに投稿されたメッセージを返し、
+    全部返し終わったら 403（チャット終了）を返す。publishedAt は再生した時刻に書き換える。
+
+    :param messages: load_recording / synthetic_chat の戻り値
+    :param poll_interval: レスポンスの pollingIntervalMillis（秒）
+    :param latency: 応答までの時間（秒）
+    :param error_rate: 500 エラーを返す割合（0〜1）
+    """
+
+    def __init__(self, messages, speed=1.0, poll_interval=2.0, latency=0.0, error_rate=0.0, port=0, seed=0):
+        self.messages = messages
+        self.speed = speed
+        self.poll_interval = poll_interval
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._started = None
+        self._started_at = None
+        self.stats = {"requests": 0, "error": 0, "delivered": 0}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, resource):
+                body = json.dumps(resource, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if not url.path.endswith("/liveChat/messages"):
+                    self._send(404, {"error": {"code": 404}})
+                    return
+                time.sleep(fake.latency)
+                query = parse_qs(url.query)
+                status, resource = fake._page(int(query.get("pageToken", ["0"])[0]),
+                                              int(query.get("maxResults", ["2000"])[0]))
+                self._send(status, resource)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def _page(self, start, max_results):
+        with self._lock:
+            self.stats["requests"] += 1
+            if self._random.random() < self.error_rate:
+                self.stats["error"] += 1
+                return 500, {"error": {"code": 500, "message": "fake error"}}
+            if start >= len(self.messages):
+                return 403, {"error": {"code": 403, "message": "liveChatEnded",
+                                       "errors": [{"domain": "youtube.liveChat", "reason": "liveChatEnded"}]}}
+            elapsed = (time.monotonic() - self._started) * self.speed
+            end = start
+            while end < len(self.messages) and end - start < max_results and self.messages[end][0] <= elapsed:
+                end += 1
+            items = []
+            for offset, item in self.messages[start:end]:
+                published = datetime.fromtimestamp(self._started_at + offset / self.speed, timezone.utc)
+                snippet = {**item["snippet"], "publishedAt": published.isoformat()}
+                items.append({**item, "snippet": snippet})
+            self.stats["delivered"] += len(items)
+        return 200, {"items": items, "nextPageToken": str(end),
+                     "pollingIntervalMillis": int(self.poll_interval * 1000)}
+
+    def start(self):
+        self._started = time.monotonic()
+        self._started_at = time.time()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def fake_play(scale=1.0):
+    """音声を再生する代わりに、その長さ（の scale 倍）だけ待つ関数を返す。"""
+
+    def play(voice):
+        with wave.open(io.BytesIO(voice)) as wav:
+            time.sleep(wav.getnframes() / wav.getframerate() * scale)
+
+    return play
+
+
+async def _sample_queues(pipeline, poller, scheduler, samples, interval):
+    while True:
+        samples.setdefault("poller", []).append(poller.buffer.qsize())
+        samples.setdefault("scheduler", []).append(len(scheduler))
+        for name, queue in pipeline.queues.items():
+            samples.setdefault(name, []).append(queue.qsize())
+        await asyncio.sleep(interval)
+
+
+async def _run_pipeline(pipeline, poller, scheduler, sample_interval):
+    samples = {}
+    sampler = asyncio.ensure_future(_sample_queues(pipeline, poller, scheduler, samples, sample_interval))
+    try:
+        await pipeline.run(poller)
+    finally:
+        sampler.cancel()
+    return samples
+
+
+def run_load_test(messages, speed=1.0, poll_interval=2.0,
+                  youtube_latency=0.05, youtube_error_rate=0.0,
+                  llm_latency=0.8, llm_error_rate=0.0,
+                  tts_latency=0.2, tts_error_rate=0.0, seconds_per_char=0.1,
+                  playback_scale=1.0, max_age=60, queue_size=4, sample_interval=0.1):
+    """
+    偽のサービスを起動して messages をパイプラインに流し、結果をまとめた dict を返す。
+    遅延の集計のため、tracing.tracer は新しいものに置き換える。
+    """
+    tracing.tracer = tracing.Tracer()
+    scheduler = CommentScheduler(max_age=max_age)
+    engine = FallbackEngine([StubEngine(latency=llm_latency, error_rate=llm_error_rate)])
+    with FakeYouTubeServer(messages, speed, poll_interval, youtube_latency, youtube_error_rate) as youtube, \
+            FakeVoicevoxServer(tts_latency, tts_error_rate, seconds_per_char=seconds_per_char) as voicevox, \
+            VoicevoxClient(voicevox.url) as client:
+        youtube_api.YOUTUBE_API_URL = youtube.url
+        poller = LiveChatPoller("load-test", "load-test", min_interval=min(1.0, poll_interval))
+        pipeline = AITuberPipeline(engine.stream, lambda text: client.synthesize(text, use_cache=False),
+                                   fake_play(playback_scale), queue_size=queue_size,
+                                   scheduler=scheduler, stream=True)
+        start = time.perf_counter()
+        # コメントごとの表示は多すぎるので出さない
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples = asyncio.run(_run_pipeline(pipeline, poller, scheduler, sample_interval))
+        duration = time.perf_counter() - start
+        services = {"youtube": youtube.stats, "voicevox": voicevox.stats, "llm": engine.stats}
+
+    spoken = pipeline.counts["spoken"]
+    return {
+        "speed": speed,
+        "duration": duration,
+        "comments": len(messages),
+        "received": pipeline.counts["received"],
+        "spoken": spoken,
+        "dropped": len(messages) - spoken,
+        "scheduler": scheduler.stats,
+        "poller": poller.stats,
+        "errors": pipeline.errors,
+        "services": services,
+        "throughput": spoken / duration,
+        "replies_per_second": scheduler.stats["batches"] / duration,
+        "queue_depth": {name: {"avg": sum(values) / len(values), "max": max(values)}
+                        for name, values in samples.items() if values},
+        "latency": tracing.tracer.summary(),
+    }
+
+
+def print_report(report):
+    pprint.pprint(f"{report['speed']}倍速 {report['duration']:.1f}秒: コメント {report['comments']}件 "
+                  f"読み上げ {report['spoken']}件 捨てた {report['dropped']}件 "
+                  f"（期限切れ {report['scheduler']['expired']} 溢れ {report['scheduler']['evicted']}）")
+    pprint.pprint(f"スループット {report['throughput']:.2f}コメント/秒 "
+                  f"{report['replies_per_second']:.2f}返信/秒 エラー {report['errors']}")
+    for name, depth in report["queue_depth"].items():
+        pprint.pprint(f"キュー {name}: 平均 {depth['avg']:.1f} 最大 {depth['max']}")
+    for stage in ("published_to_speech", "queue_wait.reply", "reply.first_sentence", "synthesis",
+                  "queue_wait.playback", "playback"):
+        item = report["latency"].get(stage)
+        if item:
+            pprint.pprint(f"{stage}: p50 {item['p50']:.2f}秒 p95 {item['p95']:.2f}秒 p99 {item['p99']:.2f}秒")
+
+
+def record_chat(api_key, chat_id, path):
+    """配信中のチャットを API のレスポンスのまま1行1ページで追記する。Ctrl+C で終わる。"""
+    page_token = None
+    with open(path, "a", encoding="utf-8") as f:
+        try:
+            while True:
+                resource = youtube_api.get_chat_messages(api_key, chat_id, page_token)
+                if resource.get("items"):
+                    f.write(json.dumps({"items": resource["items"]}, ensure_ascii=False) + "\n")
+                    f.flush()
+                page_token = resource.get("nextPageToken", page_token)
+                time.sleep(max(1.0, resource.get("pollingIntervalMillis", 0) / 1000))
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AITuber パイプラインの負荷試験")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="偽のサービスでパイプラインを動かす")
+    run.add_argument("--recording", help="記録したチャット（JSON Lines）。省略時は生成する")
+    run.add_argument("--comments", type=int, default=200, help="生成するコメント数")
+    run.add_argument("--rate", type=float, default=1.0, help="生成するコメントの1秒あたりの件数")
+    run.add_argument("--speed", type=float, nargs="+", default=[1.0], help="再生速度（例: 1 10 100）")
+    run.add_argument("--poll-interval", type=float, default=2.0)
+    run.add_argument("--youtube-latency", type=float, default=0.05)
+    run.add_argument("--youtube-error-rate", type=float, default=0.0)
+    run.add_argument("--llm-latency", type=float, default=0.8)
+    run.add_argument("--llm-error-rate", type=float, default=0.0)
+    run.add_argument("--tts-latency", type=float, default=0.2)
+    run.add_argument("--tts-error-rate", type=float, default=0.0)
+    run.add_argument("--playback-scale", type=float, default=1.0, help="再生時間の倍率（0 で待たない）")
+    run.add_argument("--max-age", type=float, default=60)
+    run.add_argument("--output", help="結果を JSON で保存するファイル")
+
+    record = subparsers.add_parser("record", help="配信中のチャットを記録する")
+    record.add_argument("chat_id")
+    record.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record_chat(os.getenv("YOUTUBE_API_KEY"), args.chat_id, args.path)
+        return
+
+    if args.recording:
+        messages = load_recording(args.recording)
+    else:
+        messages = synthetic_chat(args.comments, args.rate)
+    reports = []
+    for speed in args.speed:
+        report = run_load_test(messages, speed, args.poll_interval,
+                               args.youtube_latency, args.youtube_error_rate,
+                               args.llm_latency, args.llm_error_rate,
+                               args.tts_latency, args.tts_error_rate,
+                               playback_scale=args.playback_scale, max_age=args.max_age)
+        print_report(report)
+        reports.append(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
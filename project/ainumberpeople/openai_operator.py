@@ -1,19 +1,22 @@
-import openai
 import pprint
 import os
 from dotenv import load_dotenv
 
+from reply_engine import OpenAIEngine
+
 
 load_dotenv()
 # 自分のAPIキーをセット
-api_key = os.getenv('OPEN_API_KEY')
-client = openai.Client(api_key=api_key)
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', "gpt-3.5-turbo")
+# クライアントは最初に使うときに作る（reply_engine.OpenAIEngine を参照）
+engine = OpenAIEngine(model=OPENAI_MODEL)
+
 def chat_with_gpt(prompt):
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content
+    return engine.reply(prompt)
+
+def stream_chat_with_gpt(prompt):
+    """返信を少しずつ（届いた順に）返すジェネレータ。"""
+    yield from engine.stream(prompt)
 
 if __name__ == "__main__":
     # ユーザーとのチャット
@@ -28,4 +31,4 @@ if __name__ == "__main__":
     #     pprint.pprint(f"Chatbot: {response}")
 
     response = chat_with_gpt("good day")
-    pprint.pprint(f"Chatbot: {response}")
\ No newline at end of file
+    pprint.pprint(f"Chatbot: {response}")
@@ -0,0 +1,305 @@
+# 返信を生成する LLM を切り替えられるようにするモジュール。
+#
+# engine = CachedEngine(FallbackEngine([GeminiEngine(), OpenAIEngine()]), ReplyCache())
+# engine.reply("こんにちは")          返信全体
+# engine.stream("こんにちは")         返信を少しずつ返すイテレータ
+#
+# - GeminiEngine / OpenAIEngine はクライアントを1回だけ作って使い回す（接続の再利用）
+# - タイムアウトと、失敗したときのリトライ（指数バックオフ）を設定できる
+# - FallbackEngine は先頭から順に試し、失敗したら次の LLM を使う
+# - StubEngine は API を使わない決まった返信（テスト・負荷試験用）
+# - ReplyCache は正規化したコメントをキーにした LRU キャッシュ。埋め込み関数を渡すと
+#   意味の近いコメントにも同じ返信を返す
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import tracing
+from comment_scheduler import normalize
+
+
+class ReplyEngine:
+    """返信生成の共通インターフェース。"""
+
+    name = "engine"
+
+    def reply(self, text):
+        raise NotImplementedError
+
+    def stream(self, text):
+        yield self.reply(text)
+
+
+def _with_retry(func, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+class GeminiEngine(ReplyEngine):
+    name = "gemini"
+
+    def __init__(self, model="gemini-2.0-flash", api_key=None, timeout=30, retries=2, backoff=0.5):
+        self.model = model
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                self._client = genai.Client(
+                    api_key=self.api_key,
+                    http_options=genai.types.HttpOptions(timeout=int(self.timeout * 1000)))
+            return self._client
+
+    def reply(self, text):
+        response = _with_retry(
+            lambda: self.client.models.generate_content(model=self.model, contents=text),
+            self.retries, self.backoff)
+        return response.text
+
+    def stream(self, text):
+        # generate_content_stream はイテレータを作るだけで、通信のエラーは読み始めてから起きる。
+        # そのため最初の断片が届くまでをリトライする。途中で切れた場合は（送った断片と重なるので）
+        # リトライせず、FallbackEngine などの呼び出し元に任せる
+        def first_chunk():
+            chunks = iter(self.client.models.generate_content_stream(model=self.model, contents=text))
+            return chunks, next(chunks, None)
+
+        chunks, first = _with_retry(first_chunk, self.retries, self.backoff)
+        if first is None:
+            return
+        if first.text:
+            yield first.text
+        for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+
+class OpenAIEngine(ReplyEngine):
+    name = "openai"
+
+    def __init__(self, model="gpt-3.5-turbo", api_key=None, timeout=30, retries=2):
+        self.model = model
+        self.api_key = api_key or os.getenv('OPEN_API_KEY')
+        self.timeout = timeout
+        self.retries = retries
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import openai
+                # リトライは openai ライブラリに任せる
+                self._client = openai.Client(api_key=self.api_key, timeout=self.timeout,
+                                             max_retries=self.retries)
+            return self._client
+
+    def _create(self, text, stream=False):
+        return self.client.chat.completions.create(
+            model=self.model, messages=[{"role": "user", "content": text}], stream=stream)
+
+    def reply(self, text):
+        return self._create(text).choices[0].message.content
+
+    def stream(self, text):
+        for chunk in self._create(text, stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubEngine(ReplyEngine):
+    """
+    API を使わずに決まった返信を返す。
+
+    :param latency: 返信までの時間（秒）
+    :param error_rate: 失敗させる割合（0〜1）
+    :param seed: error_rate の乱数の種
+    """
+
+    name = "stub"
+
+    def __init__(self, template="{text}、コメントありがとう！", latency=0.0, error_rate=0.0, seed=0):
+        self.template = template
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def reply(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise RuntimeError("stub engine error")
+        return self.template.format(text=text)
+
+
+class FallbackEngine(ReplyEngine):
+    """engines を先頭から順に試し、最初に成功した返信を返す。"""
+
+    name = "fallback"
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.stats = {engine.name: {"ok": 0, "error": 0} for engine in self.engines}
+
+    def reply(self, text):
+        error = None
+        for engine in self.engines:
+            try:
+                with tracing.tracer.span(f"llm.{engine.name}"):
+                    result = engine.reply(text)
+            except Exception as e:
+                self.stats[engine.name]["error"] += 1
+                error = e
+                continue
+            self.stats[engine.name]["ok"] += 1
+            return result
+        raise error
+
+    def stream(self, text):
+        # 最初の断片が届く前に失敗した場合だけ次の LLM に切り替える
+        error = None
+        for engine in self.engines:
+            chunks = iter(engine.stream(text))
+            try:
+                # 最初の断片が届くまでの時間（体感の待ち時間に効く）を記録する
+                with tracing.tracer.span(f"llm.{engine.name}.first_chunk"):
+                    first = next(chunks, None)
+            except Exception as e:
+                self.stats[engine.name]["error"] += 1
+                error = e
+                continue
+            self.stats[engine.name]["ok"] += 1
+            if first is not None:
+                yield first
+                yield from chunks
+            return
+        raise error
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ReplyCache:
+    """
+    コメント -> 返信 の LRU キャッシュ。
+
+    :param maxsize: 保存する件数の上限
+    :param embed: テキスト -> ベクトル の関数（省略可）。指定すると、正規化しても一致しない
+                  コメントでも類似度が threshold 以上なら同じ返信を使う
+    :param threshold: 類似度（コサイン）のしきい値
+    """
+
+    def __init__(self, maxsize=256, embed=None, threshold=0.92):
+        self.maxsize = maxsize
+        self.embed = embed
+        self.threshold = threshold
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hit": 0, "similar": 0, "miss": 0}
+
+    def get(self, text):
+        key = normalize(text) or text
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+                self.stats["hit"] += 1
+                return item[0]
+        if self.embed is not None:
+            vector = self.embed(text)
+            with self._lock:
+                best_key, best = None, self.threshold
+                for other_key, (_, other_vector) in self._data.items():
+                    if other_vector is None:
+                        continue
+                    similarity = _cosine(vector, other_vector)
+                    if similarity >= best:
+                        best_key, best = other_key, similarity
+                if best_key is not None:
+                    self._data.move_to_end(best_key)
+                    self.stats["similar"] += 1
+                    return self._data[best_key][0]
+        with self._lock:
+            self.stats["miss"] += 1
+        return None
+
+    def put(self, text, reply):
+        key = normalize(text) or text
+        vector = self.embed(text) if self.embed is not None else None
+        with self._lock:
+            self._data[key] = (reply, vector)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class CachedEngine(ReplyEngine):
+    """ReplyCache にある返信はそのまま返し、ない場合だけ engine を呼ぶ。"""
+
+    def __init__(self, engine, cache=None):
+        self.engine = engine
+        self.cache = cache or ReplyCache()
+        self.name = f"cached-{engine.name}"
+
+    def reply(self, text):
+        result = self.cache.get(text)
+        if result is None:
+            result = self.engine.reply(text)
+            self.cache.put(text, result)
+        return result
+
+    def stream(self, text):
+        result = self.cache.get(text)
+        if result is not None:
+            yield result
+            return
+        chunks = []
+        for chunk in self.engine.stream(text):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(text, "".join(chunks))
+
+
+def default_engine():
+    """
+    環境変数に API キーがある LLM を Gemini → OpenAI の順に使い、キャッシュを付けたエンジン。
+    どちらのキーもない場合はエラーにする（配信で決まった返信を話し続けないように。
+    テスト・負荷試験では StubEngine を直接使う）。
+    """
+    engines = []
+    if os.getenv('GEMINI_API_KEY'):
+        engines.append(GeminiEngine())
+    if os.getenv('OPEN_API_KEY'):
+        engines.append(OpenAIEngine())
+    if not engines:
+        raise RuntimeError("GEMINI_API_KEY か OPEN_API_KEY を設定してください")
+    return CachedEngine(FallbackEngine(engines))
+
+
+if __name__ == "__main__":
+    engine = CachedEngine(FallbackEngine([StubEngine(error_rate=1.0), StubEngine()]))
+    print(engine.reply("こんにちは"))
+    print("".join(engine.stream("こんにちは！！")))
+    print(engine.cache.stats, engine.engine.stats)
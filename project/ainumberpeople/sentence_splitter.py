@@ -0,0 +1,50 @@
+# LLM のストリーミング出力（少しずつ届くテキスト）を文ごとに区切るモジュール。
+# 文が1つ完成した時点で返すので、返信全体を待たずに音声合成を始められる。
+
+# 文の終わりとみなす文字
+SENTENCE_END = "。！？!?\n"
+# 文末の直後に付く閉じ括弧など（前の文に含める）
+CLOSING = "」』）)】〉》\"'"
+# 句点がないまま長くなったときに区切る文字
+SOFT_BREAK = "、，,"
+
+
+def _find_break(text, max_length):
+    """text の中で最初に区切れる位置（区切り文字の次）を返す。ない場合は -1。"""
+    for i, char in enumerate(text):
+        if char in SENTENCE_END:
+            end = i + 1
+            while end < len(text) and (text[end] in SENTENCE_END or text[end] in CLOSING):
+                end += 1
+            # 末尾がまだ続くかもしれない場合（「！？」の途中など）は次のテキストを待つ
+            if end == len(text):
+                return -1
+            return end
+    if len(text) > max_length:
+        soft = max(text.rfind(char, 0, max_length) for char in SOFT_BREAK)
+        return soft + 1 if soft > 0 else max_length
+    return -1
+
+
+def split_sentences(chunks, max_length=80):
+    """
+    テキストの断片を受け取り、文ごとに返すジェネレータ。
+
+    :param chunks: テキストの断片のイテレータ（gemini_api.stream_reply など）
+    :param max_length: 句点がないままこの文字数を超えたら読点などで区切る
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        while (end := _find_break(buffer, max_length)) > 0:
+            sentence, buffer = buffer[:end].strip(), buffer[end:]
+            if sentence:
+                yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
+if __name__ == "__main__":
+    chunks = ["こんにちは！今日は", "いい天気ですね。", "「散歩しましょう！」", "またね"]
+    for sentence in split_sentences(chunks):
+        print(sentence)
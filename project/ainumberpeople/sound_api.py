@@ -1,28 +1,153 @@
 
-import requests
+import io
+import queue
+import threading
+import wave
+
+import numpy as np
 import sounddevice as sd
 import soundfile as sf
 import os
 import time
+import tracing
+from audio_cache import AudioCache
+from voicevox_client import VoicevoxClient
 #pip install sounddevice scipy soundfile
 
-def play_reply(comment,reply):
-    params ={"text":f"{comment} {reply}","speaker":3}
-    res= requests.post(f'http://127.0.0.1:50021/audio_query',params=params)
-    res= requests.post(f'http://127.0.0.1:50021/synthesis',params=params,json=res.json())
-    voice = res.content
+VOICEVOX_URL = "http://127.0.0.1:50021"
+VOICE_FILE_PATH = os.path.join(os.path.dirname(__file__), "material", "aituber-voice.wav")
+
+
+# 合成した音声のキャッシュ（同じテキスト・話者なら VOICEVOX を呼ばない）
+audio_cache = AudioCache()
+client = VoicevoxClient(VOICEVOX_URL, speaker=3, cache=audio_cache)
+
+
+def synthesize_voicevox(text, speaker=3):
+    """VOICEVOX で音声（WAV のバイト列）を合成する（キャッシュを使わない）。"""
+    return client.synthesize(text, speaker, use_cache=False)
+
+
+def synthesize(text, speaker=3, save_path=None, use_cache=True):
+    """
+    VOICEVOX で音声（WAV のバイト列）を合成する。
+
+    :param save_path: 指定した場合はファイルにも保存する（例: VOICE_FILE_PATH）
+    :param use_cache: False の場合は audio_cache を使わずに毎回合成する
+    """
+    # 長いテキストは文ごとに並行して合成してからつなげる
+    voice = client.synthesize_long(text, speaker, use_cache=use_cache)
+    if save_path:
+        with open(save_path,"wb") as f:
+            f.write(voice)
+    return voice
+
+
+def decode_voice(voice):
+    """
+    WAV のバイト列をファイルを経由せずに numpy 配列（フレーム数 x チャンネル数）にする。
+    16bit PCM（VOICEVOX の出力）はバッファをそのまま int16 として読む。
+
+    :return: (data, samplerate)
+    """
+    with wave.open(io.BytesIO(voice)) as wav:
+        if wav.getsampwidth() == 2:
+            frames = wav.readframes(wav.getnframes())
+            data = np.frombuffer(frames, dtype=np.int16).reshape(-1, wav.getnchannels())
+            return data, wav.getframerate()
+    data, fs = sf.read(io.BytesIO(voice), dtype="int16", always_2d=True)
+    return data, fs
+
 
-    file_path = os.path.join(os.path.dirname(__file__), "material", "aituber-voice.wav")
+class AudioPlayer:
+    """
+    出力ストリームを開いたままにして、キューに入れた音声を順に再生するプレイヤー。
+    クリップごとにデバイスを開き直さないので、続けて再生しても間があかない。
+    サンプルレート・チャンネル数が変わったときだけストリームを開き直す。
+    """
 
-    with open(file_path,"wb") as f:
-        f.write(voice)
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._stream = None
+        self._format = None
+        self._current = None
+        self._done = None
+        self._pos = 0
+        self._lock = threading.Lock()
 
-    data,fs = sf.read(file_path)
-    sd.play(data,fs)
-    sd.wait()
+    def _callback(self, outdata, frames, time_info, status):
+        written = 0
+        while written < frames:
+            if self._current is None:
+                try:
+                    self._current, self._done = self._queue.get_nowait()
+                except queue.Empty:
+                    outdata[written:] = 0
+                    return
+                self._pos = 0
+            chunk = self._current[self._pos:self._pos + frames - written]
+            outdata[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            self._pos += len(chunk)
+            if self._pos >= len(self._current):
+                self._done.set()
+                self._current = None
+
+    def _ensure_stream(self, fs, channels):
+        with self._lock:
+            if self._format == (fs, channels):
+                return
+            if self._stream is not None:
+                # 再生中のクリップが終わるのを待ってから開き直す
+                while not self._queue.empty() or self._current is not None:
+                    time.sleep(0.01)
+                self._stream.close()
+            self._stream = sd.OutputStream(samplerate=fs, channels=channels, dtype="int16",
+                                           callback=self._callback)
+            self._stream.start()
+            self._format = (fs, channels)
+
+    def play(self, voice, wait=True):
+        """
+        WAV のバイト列を再生キューに入れる。
+
+        :param wait: True の場合はこのクリップの再生が終わるまで待つ
+        :return: 再生が終わるとセットされる threading.Event
+        """
+        data, fs = decode_voice(voice)
+        self._ensure_stream(fs, data.shape[1])
+        done = threading.Event()
+        self._queue.put((data, done))
+        if wait:
+            done.wait()
+        return done
+
+    def close(self):
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+                self._format = None
+
+
+player = AudioPlayer()
+
+
+def play_voice(voice):
+    """合成した音声を再生し、再生が終わるまで待つ。"""
+    player.play(voice)
+
+
+@tracing.traced("play_reply")
+def play_reply(comment,reply):
+    # 文ごとに合成できたものから順に再生キューに入れる
+    done = None
+    for voice in client.synthesize_sentences(f"{comment} {reply}"):
+        done = player.play(voice, wait=False)
+    if done is not None:
+        done.wait()
 
 if __name__ == "__main__":
     while True:
         time.sleep(10)
         play_reply(comment="おはようございます",reply="おはようございます！✨ 今日も頑張りましょう！")
-
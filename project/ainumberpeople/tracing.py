@@ -0,0 +1,197 @@
+# AITuber パイプラインの処理時間を計測するモジュール。
+#
+# with tracer.span("reply"):             ブロックの処理時間を "reply" として記録
+# @traced("voicevox.synthesis")           関数の処理時間を記録
+# tracer.record("queue_wait.reply", 0.3)  計測済みの時間を記録
+#
+# 集計（件数・平均・p50/p95/p99）は JSON ファイルと、Prometheus 形式の /metrics で確認できる。
+# ジェネレータ関数に @traced を付けた場合は、ジェネレータ自身が値を作るのにかかった時間の合計を記録する
+# （利用側が次の値を取りに来るまでの時間、例えば前の文の再生時間は含めない）。
+import functools
+import json
+import math
+import os
+import pprint
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """直近 max_samples 件の値からパーセンタイルを計算する。件数と合計はすべての値で数える。"""
+
+    def __init__(self, max_samples=10000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        values = sorted(self.samples)
+        return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+
+class Tracer:
+    """段階（span）ごとの処理時間を集める。スレッドから同時に使ってよい。"""
+
+    def __init__(self, max_samples=10000, max_spans=1000):
+        self.max_samples = max_samples
+        self._histograms = {}
+        self.recent_spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, **attrs):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.max_samples)
+            histogram.add(seconds)
+            self.recent_spans.append({"name": name, "seconds": seconds, "end": time.time(), **attrs})
+
+    @contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, **attrs)
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for name, histogram in self._histograms.items():
+                result[name] = {
+                    "count": histogram.count,
+                    "avg": histogram.sum / histogram.count,
+                    "max": histogram.max,
+                    **{f"p{int(q * 100)}": histogram.quantile(q) for q in QUANTILES},
+                }
+            return result
+
+    def report(self):
+        for name, item in self.summary().items():
+            pprint.pprint(f"{name}: {item['count']}件 p50 {item['p50']:.2f}秒 "
+                          f"p95 {item['p95']:.2f}秒 p99 {item['p99']:.2f}秒 最大 {item['max']:.2f}秒")
+
+    def export_json(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"time": time.time(), "stages": self.summary()}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def prometheus_text(self, metric="aituber_stage_seconds"):
+        """Prometheus のテキスト形式（summary）で出力する。"""
+        lines = [f"# HELP {metric} Time spent in each AITuber pipeline stage.",
+                 f"# TYPE {metric} summary"]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{stage="{label}",quantile="{q}"}} {histogram.quantile(q)}')
+                lines.append(f'{metric}_sum{{stage="{label}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{stage="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+# モジュール全体で共有する tracer
+tracer = Tracer()
+
+
+def traced(name, tracer_=None):
+    """
+    関数の処理時間を name として記録するデコレータ。ジェネレータ関数にも使える。
+    ジェネレータの場合は next() の中で過ごした時間だけを合計し、値を返している間（利用側の処理）は数えない。
+    """
+
+    def decorator(func):
+        import inspect
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            value = next(generator)
+                        except StopIteration as e:
+                            return e.value
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield value
+                finally:
+                    generator.close()
+                    (tracer_ or tracer).record(name, elapsed)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with (tracer_ or tracer).span(name):
+                    return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def serve_metrics(port, tracer_=None, host="127.0.0.1"):
+    """
+    Prometheus 形式の /metrics（と JSON の /stats）を返すサーバーをバックグラウンドで起動する。
+    ポートに既定値はない（よく使われる 9100 は node_exporter と重なるため、環境に合わせて指定する）。
+
+    :return: ThreadingHTTPServer（shutdown() で止める）
+    """
+    target = tracer_ or tracer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = target.prometheus_text().encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/stats":
+                body = json.dumps(target.summary(), ensure_ascii=False).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_exporter(path, interval=10, tracer_=None):
+    """
+    interval 秒ごとに集計を JSON ファイルに書き出すスレッドを起動する。
+    止めるときは戻り値を set() する（最後の書き出しは呼び出し元で export_json() する）。
+    """
+    target = tracer_ or tracer
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            target.export_json(path)
+
+    threading.Thread(target=run, daemon=True).start()
+    return stop
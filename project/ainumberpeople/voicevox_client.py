@@ -0,0 +1,143 @@
+# VOICEVOX エンジンのクライアント。
+#
+# - keep-alive の接続プールを持つ requests.Session を使い回す
+# - タイムアウトと、接続エラー・5xx のリトライを設定する
+# - 長い返信は文ごとに分けて並行に合成し、元の順番で返す（まとめた WAV にも、1文ずつにもできる）
+# - asyncio から使うための async メソッドもある
+import asyncio
+import io
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import tracing
+from sentence_splitter import split_sentences
+
+VOICEVOX_URL = "http://127.0.0.1:50021"
+
+
+def concatenate_wavs(voices):
+    """同じ形式の WAV（バイト列）をつなげて1つの WAV にする。"""
+    voices = list(voices)
+    if len(voices) == 1:
+        return voices[0]
+    output = io.BytesIO()
+    with wave.open(output, "wb") as out:
+        for i, voice in enumerate(voices):
+            with wave.open(io.BytesIO(voice)) as wav:
+                if i == 0:
+                    out.setparams(wav.getparams())
+                out.writeframes(wav.readframes(wav.getnframes()))
+    return output.getvalue()
+
+
+class VoicevoxClient:
+    """
+    :param base_url: VOICEVOX エンジンの URL
+    :param speaker: 既定の話者 ID
+    :param concurrency: 同時に合成する数（接続プールの大きさ）
+    :param timeout: (接続, 読み込み) のタイムアウト（秒）
+    :param cache: audio_cache.AudioCache（省略可）
+    """
+
+    def __init__(self, base_url=VOICEVOX_URL, speaker=3, concurrency=4, timeout=(3, 60), retries=2,
+                 cache=None):
+        self.base_url = base_url
+        self.speaker = speaker
+        self.timeout = timeout
+        self.cache = cache
+        retry = Retry(total=retries, backoff_factor=0.2, status_forcelist=(500, 502, 503),
+                      allowed_methods=None)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    @tracing.traced("voicevox.synthesis")
+    def _synthesize(self, text, speaker, params=None):
+        query_params = {"text": text, "speaker": speaker}
+        res = self.session.post(f"{self.base_url}/audio_query", params=query_params, timeout=self.timeout)
+        res.raise_for_status()
+        audio_query = res.json()
+        # speedScale などの合成パラメータを上書きする
+        audio_query.update(params or {})
+        res = self.session.post(f"{self.base_url}/synthesis", params={"speaker": speaker},
+                                json=audio_query, timeout=self.timeout)
+        res.raise_for_status()
+        return res.content
+
+    def synthesize(self, text, speaker=None, params=None, use_cache=True):
+        """
+        テキストを1回で合成する。
+
+        :param params: audio_query に上書きするパラメータ（例: {"speedScale": 1.2}）
+        :return: WAV のバイト列
+        """
+        speaker = self.speaker if speaker is None else speaker
+        if self.cache is not None and use_cache:
+            return self.cache.get_or_synthesize(
+                text, speaker, lambda text, speaker: self._synthesize(text, speaker, params), params)
+        return self._synthesize(text, speaker, params)
+
+    def synthesize_sentences(self, text, speaker=None, params=None, use_cache=True):
+        """
+        文ごとに並行して合成し、元の順番で1文ずつ返すジェネレータ。
+        最初の文ができた時点で返すので、残りの合成中に再生を始められる。
+        """
+        sentences = list(split_sentences([text])) or [text]
+        futures = [self._executor.submit(self.synthesize, sentence, speaker, params, use_cache)
+                   for sentence in sentences]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def synthesize_long(self, text, speaker=None, params=None, use_cache=True):
+        """文ごとに並行して合成し、つなげた1つの WAV を返す。"""
+        return concatenate_wavs(self.synthesize_sentences(text, speaker, params, use_cache))
+
+    async def asynthesize(self, text, speaker=None, params=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.synthesize, text, speaker, params)
+
+    async def astream_sentences(self, text, speaker=None, params=None):
+        """synthesize_sentences の async 版。"""
+        sentences = list(split_sentences([text])) or [text]
+        tasks = [asyncio.ensure_future(self.asynthesize(sentence, speaker, params))
+                 for sentence in sentences]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import time
+    from fake_voicevox import FakeVoicevoxServer
+
+    text = "こんにちは！今日はいい天気ですね。散歩に行きましょう。また明日も配信します！"
+    with FakeVoicevoxServer(latency=0.1, char_latency=0.02) as server, VoicevoxClient(server.url) as client:
+        start = time.perf_counter()
+        client.synthesize(text)
+        print(f"1回で合成: {time.perf_counter() - start:.2f}秒")
+        start = time.perf_counter()
+        client.synthesize_long(text)
+        print(f"文ごとに並行して合成: {time.perf_counter() - start:.2f}秒")
@@ -1,16 +1,27 @@
 
+import asyncio
 import requests
 import os
 import pprint
-import time
-import gemini_api
-import sound_api
+import reply_engine
+import tracing
+from aituber_pipeline import AITuberPipeline
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# 処理時間の集計を書き出すファイルと、Prometheus 形式で公開するポート（未設定なら公開しない）
+LATENCY_FILE_PATH = os.path.join(os.path.dirname(__file__), "material", "latency.json")
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 0)
+
+# 負荷試験（loadtest.py）ではローカルの偽サーバーに向ける
+YOUTUBE_API_URL = os.getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3")
+
+# ライブチャットの取得で接続を使い回す
+session = requests.Session()
+
 def get_chat_id(api_key, live_id):
-    url = "https://www.googleapis.com/youtube/v3/videos"
+    url = f"{YOUTUBE_API_URL}/videos"
     params = {"key": api_key, "part": "liveStreamingDetails", "id": live_id}
     try:
         res = requests.get(url, params=params)
@@ -21,8 +32,9 @@ def get_chat_id(api_key, live_id):
         pprint.pprint(f"チャットID取得エラー: {e}")
         return None
 
+@tracing.traced("youtube.get_latest_comment")
 def get_latest_comment(api_key, chat_id, page_token=None):
-    url = "https://www.googleapis.com/youtube/v3/liveChat/messages"
+    url = f"{YOUTUBE_API_URL}/liveChat/messages"
     params = {"key": api_key, "part": "snippet", "liveChatId": chat_id, "maxResults": 2}
     if page_token:
         params["pageToken"] = page_token
@@ -36,6 +48,38 @@ def get_latest_comment(api_key, chat_id, page_token=None):
         pprint.pprint(f"コメント取得エラー: {e}")
         return None, None
 
+@tracing.traced("youtube.get_chat_messages")
+def get_chat_messages(api_key, chat_id, page_token=None, max_results=2000):
+    """
+    ライブチャットのメッセージを1ページ分取得する。
+    エラーは呼び出し元（chat_ingest.LiveChatPoller）で処理するため、例外をそのまま投げる。
+
+    :return: レスポンス（items, nextPageToken, pollingIntervalMillis を含む）
+    """
+    url = f"{YOUTUBE_API_URL}/liveChat/messages"
+    params = {"key": api_key, "part": "snippet,authorDetails", "liveChatId": chat_id,
+              "maxResults": max_results}
+    if page_token:
+        params["pageToken"] = page_token
+    res = session.get(url, params=params, timeout=10)
+    res.raise_for_status()
+    return res.json()
+
+def to_message(item):
+    """
+    liveChatMessage をパイプラインで使う形に変換する。テキスト以外（スーパーチャットのみ等）は None。
+    """
+    snippet = item.get("snippet", {})
+    text = snippet.get("textMessageDetails", {}).get("messageText") or snippet.get("displayMessage")
+    if not text:
+        return None
+    return {
+        "id": item["id"],
+        "text": text,
+        "author": item.get("authorDetails", {}).get("displayName") or snippet.get("authorChannelId"),
+        "published_at": snippet.get("publishedAt"),
+    }
+
 def main():
     api_key = os.getenv('YOUTUBE_API_KEY')
     live_id = "QfUlYtbZPkY"
@@ -44,14 +88,31 @@ def main():
         pprint.pprint("チャットIDを取得できませんでした。")
         return
     pprint.pprint(f"チャットID: {chat_id}")
-    page_token = None
-    while True:
-        comment, page_token = get_latest_comment(api_key, chat_id, page_token)
-        if comment:
-            reply = gemini_api.getReply(comment)
-            sound_api.play_reply(comment, reply)
-            pprint.pprint(f"新しいコメント: {comment}")
-        time.sleep(10)
+    # 再生デバイスを使うモジュールは配信するときだけ読み込む
+    import sound_api
+    from chat_ingest import LiveChatPoller
+    from comment_scheduler import CommentScheduler
+
+    # Gemini → OpenAI の順に使い、よくあるコメントはキャッシュから返す
+    engine = reply_engine.default_engine()
+    pipeline = AITuberPipeline(engine.stream, sound_api.synthesize, sound_api.play_voice,
+                               scheduler=CommentScheduler(max_age=60), stream=True)
+    # 配信中も latency.json と、METRICS_PORT を設定した場合は http://127.0.0.1:<METRICS_PORT>/metrics で
+    # ボトルネックを確認できる
+    metrics_server = tracing.serve_metrics(METRICS_PORT) if METRICS_PORT else None
+    exporter = tracing.start_exporter(LATENCY_FILE_PATH)
+    try:
+        asyncio.run(pipeline.run(LiveChatPoller(api_key, chat_id)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        exporter.set()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        tracing.tracer.export_json(LATENCY_FILE_PATH)
+        pipeline.stats.report()
+        pprint.pprint(pipeline.scheduler.stats)
+        pprint.pprint(engine.cache.stats)
 
 if __name__ == "__main__":
     main()
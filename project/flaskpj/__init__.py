@@ -1,7 +1,52 @@
+import os
+
 from flask import Flask
-app = Flask(__name__)
-import flaskpj.main
+from jinja2 import FileSystemBytecodeCache
+
+from flaskpj import config as flaskpj_config
+
+
+def create_app(config=None):
+    """
+    アプリを作る（アプリケーションファクトリ）。import しただけではアプリを作らない。
+
+    flask run は FLASK_APP=flaskpj で create_app() を見つけて使う。本番は wsgi.py / asgi.py から作る。
+
+    :param config: "development" / "production" / 設定クラス（省略時は FLASKPJ_CONFIG 環境変数）
+    """
+    app = Flask(__name__)
+    config = config or os.getenv("FLASKPJ_CONFIG", "development")
+    if isinstance(config, str):
+        config = flaskpj_config.CONFIGS[config]
+    app.config.from_object(config)
+    # FLASKPJ_SECRET_KEY などの環境変数で上書きできる
+    app.config.from_prefixed_env("FLASKPJ")
+    if not app.config.get("SECRET_KEY"):
+        raise RuntimeError("SECRET_KEY が設定されていません（環境変数 FLASKPJ_SECRET_KEY で設定する）")
+
+    # コンパイルしたテンプレートをファイルに保存し、ワーカーの起動時に使い回す
+    cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
 
+    from flaskpj.main import bp
+    from flaskpj.util import (book_store, cache_util, compress_util, db_util, login_util, profile_util,
+                              session_util, static_util)
+    app.register_blueprint(bp)
+    db_util.init_app(app)
+    book_store.init_db(app.extensions["flaskpj_db"])
+    book_store.register_commands(app)
+    login_util.init_db(app.extensions["flaskpj_db"])
+    login_util.register_commands(app)
+    session_util.init_app(app, app.extensions["flaskpj_db"])
+    cache_util.init_app(app)
+    static_util.init_app(app)
+    compress_util.init_app(app)
+    profile_util.init_app(app)
 
-# if __name__ == "__main__":
-#     app.run()
\ No newline at end of file
+    if app.config.get("PRELOAD_TEMPLATES"):
+        # gunicorn の preload_app と組み合わせると、コンパイルはマスターで1回だけになる
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+    return app
@@ -0,0 +1,8 @@
+# ASGI サーバーで動かす場合のエントリポイント（project ディレクトリで実行する）
+# pip install uvicorn asgiref
+# uvicorn flaskpj.asgi:app --workers 4
+from asgiref.wsgi import WsgiToAsgi
+
+from flaskpj.wsgi import app as wsgi_app
+
+app = WsgiToAsgi(wsgi_app)
@@ -0,0 +1,64 @@
+import os
+
+BASE_DIR = os.path.dirname(__file__)
+
+
+class Config:
+    SECRET_KEY = "dev"
+    # Jinja のバイトコードキャッシュの場所（None の場合は使わない）
+    JINJA_BYTECODE_CACHE_DIR = None
+    # 起動時に全テンプレートをコンパイルしておく
+    PRELOAD_TEMPLATES = False
+    # url_for('static', ...) にファイル内容のハッシュをつけ、長期間キャッシュさせる
+    STATIC_HASH_URLS = True
+    STATIC_MAX_AGE = 365 * 24 * 60 * 60
+    # レスポンスの圧縮（gzip / brotli）
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = ("text/html", "text/css", "text/plain", "text/javascript",
+                          "application/javascript", "application/json")
+    # ビューのキャッシュ（cache_util.cached）。"memory" はワーカーごと、"file" は全ワーカーで共有
+    CACHE_BACKEND = "memory"
+    # 保存する件数の上限（どちらの方式でも）
+    CACHE_MAXSIZE = 1024
+    CACHE_DIR = os.path.join(BASE_DIR, "instance", "view_cache")
+    # "file" の場合、この秒数ごとに期限切れ・上限を超えたファイルを消す
+    CACHE_SWEEP_INTERVAL = 60
+    # ユーザー・セッションなどを保存する SQLite
+    DATABASE = os.path.join(BASE_DIR, "instance", "flaskpj.sqlite3")
+    DB_POOL_SIZE = 8
+    # パスワードハッシュ（PBKDF2-SHA256）の繰り返し回数
+    PASSWORD_HASH_ITERATIONS = 600000
+    SESSION_TTL = 24 * 60 * 60
+    SESSION_COOKIE_HTTPONLY = True
+    SESSION_COOKIE_SAMESITE = "Lax"
+    # 1つの IP からのログインの試行は LOGIN_RATE_WINDOW 秒あたり LOGIN_RATE_LIMIT 回まで（0 で無制限）
+    LOGIN_RATE_LIMIT = 10
+    LOGIN_RATE_WINDOW = 60
+    # N 件に1件のリクエストをプロファイルする（0 で無効）。PROFILER は "cprofile" か "pyinstrument"
+    PROFILE_EVERY = 0
+    PROFILER = "cprofile"
+    PROFILE_DIR = os.path.join(BASE_DIR, "instance", "profiles")
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    TEMPLATES_AUTO_RELOAD = True
+    # 開発中はログインを待たないように軽くする
+    PASSWORD_HASH_ITERATIONS = 10000
+
+
+class ProductionConfig(Config):
+    # 本番では必ず FLASKPJ_SECRET_KEY で設定する（未設定なら create_app でエラーにする）
+    SECRET_KEY = None
+    JINJA_BYTECODE_CACHE_DIR = os.path.join(BASE_DIR, "instance", "jinja_cache")
+    PRELOAD_TEMPLATES = True
+    TEMPLATES_AUTO_RELOAD = False
+    CACHE_BACKEND = "file"
+    SESSION_COOKIE_SECURE = True
+
+
+CONFIGS = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+}
@@ -0,0 +1,25 @@
+# gunicorn の設定（gunicorn -c flaskpj/gunicorn.conf.py flaskpj.wsgi:app）
+# 環境変数 GUNICORN_WORKERS / GUNICORN_THREADS / GUNICORN_BIND で変えられる
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# ワーカーごとにスレッドを持たせ、I/O 待ちの間も他のリクエストを処理する
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+# マスターでアプリを読み込んでから fork する（テンプレートのコンパイルも1回で済む）
+preload_app = True
+keepalive = 5
+timeout = 30
+# メモリが増え続けないように、一定数のリクエストでワーカーを入れ替える
+max_requests = 10000
+max_requests_jitter = 1000
+accesslog = "-"
+
+
+def worker_exit(server, worker):
+    # FLASKPJ_PROFILE_EVERY を指定したときは、ワーカーの終了時にプロファイルを保存する
+    from flaskpj.util import profile_util
+
+    profile_util.dump_profiles(worker.wsgi)
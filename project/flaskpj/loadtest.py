@@ -0,0 +1,267 @@
+# flaskpj の負荷試験（project ディレクトリで実行する）
+#
+# python -m flaskpj.loadtest                                   アプリをこのプロセス内で動かして試験
+# python -m flaskpj.loadtest --mode werkzeug --clients 16      ローカルのサーバーを起動して試験
+# python -m flaskpj.loadtest --mode gunicorn --workers 4       gunicorn を起動して試験（pip install gunicorn）
+# python -m flaskpj.loadtest --url http://127.0.0.1:8000       起動済みのサーバーに対して試験
+# python -m flaskpj.loadtest --mix index=5,login=1,post=3,path=2 --profile-every 20
+# python -m flaskpj.loadtest --mix books=1,api=1 --books 300000    本の件数を増やして一覧の応答時間を見る
+#
+# --profile-every N を指定すると N 件に1件のリクエストをプロファイルし、遅いエンドポイントの
+# プロファイル（cProfile: .prof / pyinstrument: .speedscope.json）を --profile-dir に保存する。
+import argparse
+import json
+import logging
+import os
+import random
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from flaskpj import create_app
+from flaskpj.login_benchmark import PASSWORD, USERNAME, free_port, percentile, wait_until_up
+from flaskpj.util import book_store, login_util, profile_util, user_store
+
+DEFAULT_MIX = "index=5,login=1,post=3,path=2"
+SUBPATHS = ("docs/readme", "images/cover.png", "a/b/c/d", "books/python", "books/flask")
+
+
+def make_request(route, rand, ids):
+    """ルート名から (メソッド, パス, フォームデータ) を作る。"""
+    if route == "index":
+        return "GET", "/", None
+    if route == "login":
+        return "POST", "/login", {"username": USERNAME, "password": PASSWORD}
+    if route == "post":
+        return "GET", f"/post/{rand.randrange(ids)}", None
+    if route == "path":
+        return "GET", f"/path/{rand.choice(SUBPATHS)}/{rand.randrange(ids)}", None
+    if route == "books":
+        # 並べ替え・価格の条件を変えた一覧（キャッシュに当たらないように毎回違う条件にする）
+        sort = rand.choice(book_store.SORT_COLUMNS)
+        order = rand.choice(("asc", "desc"))
+        return "GET", f"/?sort={sort}&order={order}&min_price={rand.randrange(500, 10000)}", None
+    if route == "api":
+        return "GET", f"/api/books?sort=price&min_price={rand.randrange(500, 10000)}&limit=1000", None
+    raise ValueError(f"unknown route: {route}")
+
+
+def parse_mix(text):
+    """"index=5,login=1" を {"index": 5, "login": 1} にする。"""
+    mix = {}
+    for item in text.split(","):
+        route, _, weight = item.partition("=")
+        mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        # ストリーミングのレスポンスも最後まで読んでから時間を測る
+        response.get_data()
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None):
+        return self.session.request(method, self.base_url + path, data=data, allow_redirects=False,
+                                    timeout=30).status_code
+
+
+def drive(make_client, mix, clients=8, duration=10, ids=1000, seed=0):
+    """
+    clients 個のスレッドから duration 秒間、mix の割合でリクエストを送る。
+
+    :return: {ルート名: {"latencies": [...], "statuses": {ステータス: 件数}, "errors": 件数}}
+    """
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    results = {route: {"latencies": [], "statuses": {}, "errors": 0} for route in routes}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def run_client(index):
+        rand = random.Random(seed + index)
+        client = make_client()
+        while time.monotonic() < deadline:
+            route = rand.choices(routes, weights)[0]
+            method, path, data = make_request(route, rand, ids)
+            start = time.perf_counter()
+            try:
+                status = client.request(method, path, data)
+            except requests.exceptions.RequestException:
+                status = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                result = results[route]
+                result["latencies"].append(elapsed)
+                result["statuses"][status] = result["statuses"].get(status, 0) + 1
+                if status is None or status >= 500:
+                    result["errors"] += 1
+
+    threads = [threading.Thread(target=run_client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results, duration):
+    """ルートごとと全体の RPS・応答時間のパーセンタイルを計算する。"""
+    summary = {}
+    everything = []
+    errors = 0
+    for route, result in results.items():
+        latencies = result["latencies"]
+        everything.extend(latencies)
+        errors += result["errors"]
+        summary[route] = {
+            "requests": len(latencies),
+            "rps": len(latencies) / duration,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies, default=0.0),
+            "errors": result["errors"],
+            "statuses": {str(status): count for status, count in result["statuses"].items()},
+        }
+    summary["total"] = {
+        "requests": len(everything),
+        "rps": len(everything) / duration,
+        "p50": percentile(everything, 0.5),
+        "p95": percentile(everything, 0.95),
+        "p99": percentile(everything, 0.99),
+        "max": max(everything, default=0.0),
+        "errors": errors,
+    }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'route':<8} {'requests':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'errors':>6}")
+    for route, item in summary.items():
+        print(f"{route:<8} {item['requests']:>8} {item['rps']:>8.1f} {item['p50'] * 1000:>8.1f} "
+              f"{item['p95'] * 1000:>8.1f} {item['p99'] * 1000:>8.1f} {item['max'] * 1000:>8.1f} "
+              f"{item['errors']:>6}")
+
+
+def prepare_environment(tmp, iterations, profile_every, profiler, profile_dir, books=0):
+    """一時ディレクトリのデータベースを使う設定を環境変数に入れ、ログイン用のユーザーと books 冊の本を作る。"""
+    env = {
+        # 本番の設定は SECRET_KEY が必須なので、未設定なら試験用に作る
+        "FLASKPJ_SECRET_KEY": os.environ.get("FLASKPJ_SECRET_KEY") or secrets.token_hex(32),
+        "FLASKPJ_DATABASE": os.path.join(tmp, "loadtest.sqlite3"),
+        "FLASKPJ_CACHE_DIR": os.path.join(tmp, "view_cache"),
+        "FLASKPJ_PASSWORD_HASH_ITERATIONS": str(iterations),
+        "FLASKPJ_LOGIN_RATE_LIMIT": "0",
+        "FLASKPJ_PROFILE_EVERY": str(profile_every),
+        "FLASKPJ_PROFILER": profiler,
+        "FLASKPJ_PROFILE_DIR": profile_dir,
+    }
+    os.environ.update(env)
+    app = create_app("production")
+    with app.app_context():
+        user_store.add_user(USERNAME, login_util.hash_password(PASSWORD))
+        if books:
+            book_store.add_books(book_store.generate_books(books))
+    return app
+
+
+def run(mode="inprocess", url=None, mix=DEFAULT_MIX, clients=8, duration=10, ids=1000, workers=2,
+        iterations=100000, profile_every=0, profiler="cprofile", profile_dir="profiles", top=3, books=0):
+    mix = parse_mix(mix)
+    profile_dir = os.path.abspath(profile_dir)
+    if url:
+        results = drive(lambda: HttpClient(url), mix, clients, duration, ids)
+        return summarize(results, duration), []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = prepare_environment(tmp, iterations, profile_every, profiler, profile_dir, books)
+        if mode == "inprocess":
+            results = drive(lambda: InProcessClient(app), mix, clients, duration, ids)
+        elif mode == "werkzeug":
+            # リクエストごとのログは多すぎるので出さない
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+            server = make_server("127.0.0.1", free_port(), app, threaded=True)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                base_url = f"http://127.0.0.1:{server.server_port}"
+                results = drive(lambda: HttpClient(base_url), mix, clients, duration, ids)
+            finally:
+                server.shutdown()
+        elif mode == "gunicorn":
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "flaskpj/gunicorn.conf.py", "-b", f"127.0.0.1:{port}",
+                 "-w", str(workers), "--access-logfile", "/dev/null", "flaskpj.wsgi:app"],
+                env=os.environ.copy(), stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(f"{base_url}/login")
+                results = drive(lambda: HttpClient(base_url), mix, clients, duration, ids)
+            finally:
+                # SIGTERM で止めると、各ワーカーが終了時にプロファイルを保存する（gunicorn.conf.py）
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+        else:
+            raise ValueError(f"unknown mode: {mode}")
+
+    summary = summarize(results, duration)
+    paths = []
+    if profile_every and mode != "gunicorn":
+        paths = profile_util.dump_profiles(app, profile_dir, top)
+    elif profile_every:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(profile_dir) for name in names]
+    return summary, paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="flaskpj の負荷試験")
+    parser.add_argument("--mode", choices=("inprocess", "werkzeug", "gunicorn"), default="inprocess")
+    parser.add_argument("--url", help="起動済みのサーバーの URL（指定した場合は --mode を使わない）")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="ルートごとの割合（ルート: index, login, post, path, books, api）")
+    parser.add_argument("--clients", type=int, default=8, help="同時にリクエストを送るクライアント数")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--ids", type=int, default=1000, help="/post・/path に使う ID の種類の数")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn のワーカー数")
+    parser.add_argument("--iterations", type=int, default=100000, help="PBKDF2 の繰り返し回数")
+    parser.add_argument("--books", type=int, default=0, help="試験の前に追加する本の冊数")
+    parser.add_argument("--profile-every", type=int, default=0, help="N 件に1件プロファイルする（0 で無効）")
+    parser.add_argument("--profiler", choices=("cprofile", "pyinstrument"), default="cprofile")
+    parser.add_argument("--profile-dir", default="profiles")
+    parser.add_argument("--top", type=int, default=3, help="プロファイルを保存する遅いエンドポイントの数")
+    parser.add_argument("--output", help="結果を JSON で保存するファイル")
+    args = parser.parse_args()
+
+    summary, paths = run(args.mode, args.url, args.mix, args.clients, args.duration, args.ids, args.workers,
+                         args.iterations, args.profile_every, args.profiler, args.profile_dir, args.top,
+                         args.books)
+    print_summary(summary)
+    for path in paths:
+        print(f"profile: {path}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
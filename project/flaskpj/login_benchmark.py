@@ -0,0 +1,121 @@
+# ワーカー数ごとのログインのスループットを測る（project ディレクトリで実行する）
+# pip install gunicorn requests
+# python -m flaskpj.login_benchmark --workers 1 2 4 --clients 16 --duration 10
+import argparse
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from flaskpj import create_app
+from flaskpj.util import login_util, user_store
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start: {url}")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def drive_logins(url, clients, duration):
+    """clients 個のスレッドから duration 秒間ログインし続け、(成功数, 失敗数, 応答時間のリスト) を返す。"""
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        http = requests.Session()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            res = http.post(f"{url}/login", data={"username": USERNAME, "password": PASSWORD},
+                            allow_redirects=False, timeout=30)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if res.status_code == 302:
+                    latencies.append(elapsed)
+                else:
+                    failures[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), failures[0], latencies
+
+
+def run(workers, clients, duration, iterations, threads=4):
+    """ワーカー数ごとに gunicorn を起動してログインのスループットを測る。"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   FLASKPJ_SECRET_KEY=os.environ.get("FLASKPJ_SECRET_KEY") or secrets.token_hex(32),
+                   FLASKPJ_DATABASE=os.path.join(tmp, "bench.sqlite3"),
+                   FLASKPJ_CACHE_DIR=os.path.join(tmp, "view_cache"),
+                   FLASKPJ_PASSWORD_HASH_ITERATIONS=str(iterations),
+                   FLASKPJ_LOGIN_RATE_LIMIT="0")
+        os.environ.update(env)
+        app = create_app("production")
+        with app.app_context():
+            user_store.add_user(USERNAME, login_util.hash_password(PASSWORD))
+
+        for count in workers:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "flaskpj/gunicorn.conf.py", "-b", f"127.0.0.1:{port}",
+                 "-w", str(count), "--threads", str(threads), "--access-logfile", "/dev/null",
+                 "flaskpj.wsgi:app"], env=env, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(f"{url}/login")
+                ok, failed, latencies = drive_logins(url, clients, duration)
+            finally:
+                server.terminate()
+                server.wait()
+            result = {"workers": count, "logins": ok, "failed": failed, "per_second": ok / duration,
+                      "p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95)}
+            print(f"workers={count}: {result['per_second']:.1f} logins/s "
+                  f"p50 {result['p50'] * 1000:.0f}ms p95 {result['p95'] * 1000:.0f}ms failed {failed}")
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ログインのスループットの計測")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4, help="ワーカーごとのスレッド数")
+    parser.add_argument("--clients", type=int, default=16, help="同時にログインするクライアント数")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--iterations", type=int, default=600000, help="PBKDF2 の繰り返し回数")
+    args = parser.parse_args()
+    run(args.workers, args.clients, args.duration, args.iterations, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,124 @@
-from flaskpj import app
+import json
+
+from flask import Blueprint
+from flask import Response
+from flask import abort
 from flask import render_template
+from flask import stream_with_context
 from flask import url_for
 from markupsafe import escape
 from flask import request
+from flask import session
+import flaskpj.util.book_store as book_store
 import flaskpj.util.login_util as login_util
+from flaskpj.util.cache_util import cached
+
+bp = Blueprint('main', __name__)
+
+# /api/books で1回に送る冊数
+API_BATCH_SIZE = 500
+# 次のページの URL に引き継ぐクエリ文字列（url_for に任意のキーを渡さないように限定する）
+PAGE_ARGS = ('title', 'min_price', 'max_price', 'arrival_from', 'arrival_to', 'sort', 'order', 'page_size')
 
 
-@app.route('/')
+def book_filters():
+    """クエリ文字列から本の検索条件を作る。不正な値の場合は 400。"""
+    args = request.args
+    filters = {
+        'title':args.get('title') or None,
+        'min_price':args.get('min_price', type=int),
+        'max_price':args.get('max_price', type=int),
+        'arrival_from':args.get('arrival_from') or None,
+        'arrival_to':args.get('arrival_to') or None,
+        'sort':args.get('sort', 'arrival_day'),
+        'descending':args.get('order') == 'desc',
+        'after':args.get('after') or None,
+    }
+    if filters['sort'] not in book_store.SORT_COLUMNS:
+        abort(400, f"sort must be one of {', '.join(book_store.SORT_COLUMNS)}")
+    return filters
+
+
+@bp.route('/')
+@cached(ttl=60)
 def index():
-    books =[{
-        'title':'welcome to our python world',
-        'price':3000,
-        'arrival_day':'2029-08-12'
-    },{
-         'title':'welcome to flask world',
-        'price':2000,
-        'arrival_day':'2030-08-12'
-    }]
-    return render_template('index.html',books=books)
-
-@app.route("/escape_handler/<name>")
+    filters = book_filters()
+    try:
+        books, next_cursor = book_store.list_books(request.args.get('page_size', 20, type=int), **filters)
+    except ValueError as e:
+        abort(400, str(e))
+    next_url = None
+    if next_cursor:
+        # 今の検索条件のまま次のページへ
+        args = {key:request.args[key] for key in PAGE_ARGS if request.args.get(key)}
+        next_url = url_for('main.index', **args, after=next_cursor)
+    return render_template('index.html',books=books,next_url=next_url,filters=filters,
+                           sort_columns=book_store.SORT_COLUMNS)
+
+@bp.route('/api/books')
+def api_books():
+    """
+    条件に合う本を JSON の配列で返す。件数が多くても全件をメモリに載せず、読みながら送る。
+    limit を省略した場合は条件に合う全件を返す（データベースの接続は API_BATCH_SIZE 件ごとに返す）。
+    """
+    filters = book_filters()
+    limit = request.args.get('limit', type=int)
+    # ストリームを始めてからはエラーを返せないので、cursor は先に確認する
+    if filters['after']:
+        try:
+            book_store.decode_cursor(filters['after'])
+        except ValueError as e:
+            abort(400, str(e))
+
+    def generate():
+        # 1冊ずつ送ると小さな書き込みが多くなるので、BATCH 冊ずつまとめて送る
+        yield '['
+        separator = ''
+        chunk = []
+        for book in book_store.iter_books(batch_size=API_BATCH_SIZE, limit=limit, **filters):
+            chunk.append(json.dumps(book, ensure_ascii=False))
+            if len(chunk) == API_BATCH_SIZE:
+                yield separator + ','.join(chunk)
+                separator = ','
+                chunk = []
+        if chunk:
+            yield separator + ','.join(chunk)
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@bp.route("/escape_handler/<name>")
+@cached(ttl=300)
 def escape_handler(name):
     return render_template('escape_handler.html',backvalue=f"handle data,{escape(name)}")
 
-@app.route("/post/<int:post_id>")
+@bp.route("/post/<int:post_id>")
+@cached(ttl=300)
 def show_post(post_id):
     return f'Post{post_id}'
 
-@app.route('/path/<path:subpath>')
+@bp.route('/path/<path:subpath>')
+@cached(ttl=300)
 def show_subpath(subpath):
     return f'Subpath{escape(subpath)}'
 
-@app.route('/login',methods=['GET','POST'])
+@bp.route('/login',methods=['GET','POST'])
 def login():
     error=None
+    status=200
     if request.method == 'POST':
-        if login_util.valid_login(request.form['username'],
-                       request.form['password']):
+        if login_util.is_rate_limited(request.remote_addr):
+            error = 'Too many login attempts. Please try again later.'
+            status = 429
+        elif login_util.valid_login(request.form.get('username', ''),
+                       request.form.get('password', '')):
             return login_util.log_user_in(request.form['username'])
         else:
             error = 'Invalid username/password'
+            status = 401
 
-    else:
-        return render_template('login.html')
-
-
-
+    return render_template('login.html',error=error,username=session.get('username')),status
 
-with app.test_request_context():
-    print(url_for('index'))
-    # print(url_for('login'))
-    print(url_for('escape_handler',name='John Doe'))
\ No newline at end of file
+@bp.route('/logout',methods=['POST'])
+def logout():
+    return login_util.log_user_out()
@@ -1,35 +1,12 @@
-var count = 2;
-
-function validate ()
+// ユーザー名とパスワードの確認はサーバー側（/login）で行う。ここでは空欄だけを確認する
+function validateForm ()
 {
    var user = document.login.username.value;
    var password = document.login.password.value;
-   var valid = false;
-   var usernameArray = ["yuki"]
-   var passwordArray = ["123"]
-   for (var i = 0; i < usernameArray.length; i++)
-
-if (user == usernameArray[i])
-if (password == passwordArray [i])
-{
-   valid = true;
-   break;
-}
-
-if(valid)
-{
-   alert("Login was successful");
-   window.location = "wwww.google.ie"
-   return false ;
-}
-var again = "tries";
-if (count ==1)
-{
-   again = "try"
-}
-if(count >= 1)
-{
-   alert("Wrong password or username")
-   count--;
+   if (user == "" || password == "")
+   {
+      alert("Please enter your username and password");
+      return false;
+   }
+   return true;
 }
-}
\ No newline at end of file
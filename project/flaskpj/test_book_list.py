@@ -0,0 +1,82 @@
+import base64
+import html
+import json
+import os
+import re
+import tempfile
+import unittest
+from urllib.parse import parse_qs, urlsplit
+
+from flaskpj import create_app
+from flaskpj.config import DevelopmentConfig
+from flaskpj.util import book_store
+
+
+def make_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+class TestBookList(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+        class TestConfig(DevelopmentConfig):
+            DATABASE = os.path.join(self.tmp.name, "test.sqlite3")
+            CACHE_BACKEND = "memory"
+
+        self.app = create_app(TestConfig)
+        with self.app.app_context():
+            book_store.add_books(book_store.generate_books(5))
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def next_url(self, response):
+        match = re.search(r'<a href="([^"]+)">next</a>', response.get_data(as_text=True))
+        return html.unescape(match.group(1)) if match else None
+
+    def test_next_url_keeps_filters(self):
+        response = self.client.get("/?page_size=2&sort=price&order=desc&min_price=0")
+        self.assertEqual(response.status_code, 200)
+        url = urlsplit(self.next_url(response))
+        self.assertEqual(url.path, "/")
+        query = parse_qs(url.query)
+        self.assertEqual(query["sort"], ["price"])
+        self.assertEqual(query["order"], ["desc"])
+        self.assertEqual(query["page_size"], ["2"])
+        self.assertIn("after", query)
+
+        next_page = self.client.get(f"{url.path}?{url.query}")
+        self.assertEqual(next_page.status_code, 200)
+        self.assertNotEqual(response.get_data(), next_page.get_data())
+
+    def test_next_url_ignores_unknown_args(self):
+        for extra in ("endpoint=x", "_method=POST", "_external=1", "_scheme=javascript", "_anchor=x"):
+            with self.subTest(extra=extra):
+                response = self.client.get(f"/?page_size=1&{extra}")
+                self.assertEqual(response.status_code, 200)
+                url = self.next_url(response)
+                self.assertTrue(url.startswith("/?"))
+                self.assertNotIn("#", url)
+                self.assertEqual(set(parse_qs(urlsplit(url).query)), {"page_size", "after"})
+
+    def test_decode_cursor_rejects_malformed(self):
+        book = {"id": 3, "price": 1200}
+        self.assertEqual(book_store.decode_cursor(book_store.encode_cursor(book, "price")), (1200, 3))
+        for value in ([1, [2]], [1], [1, 2, 3], 5, {"a": 1, "b": 2}, [[1], 2], [1, True], [1.5, 2],
+                      [1, 2 ** 70], "ab"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    book_store.decode_cursor(make_cursor(value))
+        with self.assertRaises(ValueError):
+            book_store.decode_cursor("%%%")
+
+    def test_malformed_cursor_is_bad_request(self):
+        cursor = make_cursor([1, [2]])
+        self.assertEqual(self.client.get(f"/?after={cursor}").status_code, 400)
+        self.assertEqual(self.client.get(f"/api/books?after={cursor}").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
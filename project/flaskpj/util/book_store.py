@@ -0,0 +1,188 @@
+import base64
+import datetime
+import itertools
+import json
+import random
+
+import click
+
+from flaskpj.util.db_util import get_pool
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    arrival_day TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_title ON books (title);
+CREATE INDEX IF NOT EXISTS books_price ON books (price);
+CREATE INDEX IF NOT EXISTS books_arrival_day ON books (arrival_day);
+"""
+
+# 並べ替えに使える列。SQLite のインデックスには末尾に id（rowid）が含まれるので、
+# (列, id) の順に並べるとインデックスを順に読むだけで済む
+SORT_COLUMNS = ("title", "price", "arrival_day")
+MAX_PAGE_SIZE = 100
+# SQLite の INTEGER の範囲（cursor の値がこれを超えると SQLite に渡せない）
+_INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+INITIAL_BOOKS = ({
+    'title':'welcome to our python world',
+    'price':3000,
+    'arrival_day':'2029-08-12'
+},{
+    'title':'welcome to flask world',
+    'price':2000,
+    'arrival_day':'2030-08-12'
+})
+
+
+def init_db(pool):
+    with pool.connection() as conn:
+        conn.executescript(SCHEMA)
+        if conn.execute("SELECT 1 FROM books LIMIT 1").fetchone() is None:
+            conn.executemany("INSERT INTO books (title, price, arrival_day) VALUES (:title, :price, :arrival_day)",
+                             INITIAL_BOOKS)
+
+
+def add_books(books, pool=None):
+    """books（title, price, arrival_day を持つ dict のイテラブル）をまとめて追加する。"""
+    with (pool or get_pool()).transaction() as conn:
+        conn.executemany("INSERT INTO books (title, price, arrival_day) VALUES (:title, :price, :arrival_day)",
+                         books)
+
+
+def generate_books(count, seed=0):
+    """負荷試験用の本を count 冊作る。"""
+    rand = random.Random(seed)
+    words = ("python", "flask", "world", "data", "web", "guide", "cookbook", "deep", "learning", "sqlite",
+             "async", "design", "patterns", "practical", "modern", "introduction")
+    start = datetime.date(2020, 1, 1)
+    for i in range(count):
+        yield {
+            "title": " ".join(rand.sample(words, 3)) + f" vol.{i}",
+            "price": rand.randrange(500, 10000, 10),
+            "arrival_day": (start + datetime.timedelta(days=rand.randrange(3650))).isoformat(),
+        }
+
+
+def encode_cursor(book, sort):
+    """次のページの開始位置（最後の本の並べ替えの値と id）を URL に入れられる文字列にする。"""
+    raw = json.dumps([book[sort], book["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """encode_cursor の逆。不正な値の場合は ValueError。"""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        # [並べ替えの値（文字列か整数）, id（整数）] の形だけを受け付ける
+        if not isinstance(decoded, list) or len(decoded) != 2:
+            raise ValueError(f"unexpected shape: {decoded!r}")
+        value, book_id = decoded
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            raise ValueError(f"unexpected value: {value!r}")
+        if isinstance(book_id, bool) or not isinstance(book_id, int):
+            raise ValueError(f"unexpected id: {book_id!r}")
+        if book_id not in _INTEGER_RANGE or (isinstance(value, int) and value not in _INTEGER_RANGE):
+            raise ValueError("out of range")
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+    return value, book_id
+
+
+def _query(title=None, min_price=None, max_price=None, arrival_from=None, arrival_to=None,
+           sort="arrival_day", descending=False, after=None, limit=None):
+    # title の前方一致と price / arrival_day の並べ替えを組み合わせると、1つのインデックスでは
+    # 絞り込みと並べ替えの両方ができない。SQLite は一致した本をすべて読んでから並べ替える（一時 B-tree）ので、
+    # 一致する冊数に比例して遅くなる（30万冊のうち約2万冊が一致する場合で数十ミリ秒）。
+    # (title, price) のような複合インデックスも、title が範囲の条件なので並べ替えには使えない
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"invalid sort: {sort}")
+    conditions = []
+    params = []
+    if title:
+        # 前方一致。LIKE ではなく範囲にすると title のインデックスを使える
+        conditions.append("title >= ? AND title < ?")
+        params += [title, title + "\uffff"]
+    if min_price is not None:
+        conditions.append("price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("price <= ?")
+        params.append(max_price)
+    if arrival_from:
+        conditions.append("arrival_day >= ?")
+        params.append(arrival_from)
+    if arrival_to:
+        conditions.append("arrival_day <= ?")
+        params.append(arrival_to)
+    if after:
+        # キーセットページネーション: OFFSET を使わないので、何ページ目でも同じ速さで読める
+        conditions.append(f"({sort}, id) {'<' if descending else '>'} (?, ?)")
+        params += list(decode_cursor(after))
+    order = "DESC" if descending else "ASC"
+    sql = "SELECT id, title, price, arrival_day FROM books"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {sort} {order}, id {order}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+
+def list_books(page_size=20, pool=None, **filters):
+    """
+    条件に合う本を1ページ分返す。
+
+    :param filters: title（前方一致）, min_price, max_price, arrival_from, arrival_to,
+                    sort（title / price / arrival_day）, descending, after（前のページの next_cursor）
+    :return: (本の dict のリスト, 次のページの cursor（最後のページなら None）)
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    # 1件多く読んで次のページがあるかを調べる
+    sql, params = _query(limit=page_size + 1, **filters)
+    with (pool or get_pool()).connection() as conn:
+        books = [dict(row) for row in conn.execute(sql, params)]
+    next_cursor = None
+    if len(books) > page_size:
+        books = books[:page_size]
+        next_cursor = encode_cursor(books[-1], filters.get("sort", "arrival_day"))
+    return books, next_cursor
+
+
+def iter_books(pool=None, batch_size=500, limit=None, **filters):
+    """
+    条件に合う本を1冊ずつ返すジェネレータ。全件をメモリに載せない。
+    batch_size 件ずつキーセットページネーションで読み、バッチの間は接続をプールに返す。
+    受け取るのが遅いクライアントがいても、接続を持ち続けたり、長い読み取りで WAL の
+    チェックポイントを止めたりしない（そのかわり、読んでいる間に追加された本が途中から含まれることがある）。
+    """
+    pool = pool or get_pool()
+    sort = filters.get("sort", "arrival_day")
+    after = filters.pop("after", None)
+    while limit is None or limit > 0:
+        size = batch_size if limit is None else min(batch_size, limit)
+        sql, params = _query(limit=size, after=after, **filters)
+        with pool.connection() as conn:
+            books = [dict(row) for row in conn.execute(sql, params)]
+        yield from books
+        if len(books) < size:
+            return
+        after = encode_cursor(books[-1], sort)
+        if limit is not None:
+            limit -= len(books)
+
+
+def register_commands(app):
+    @app.cli.command("seed-books")
+    @click.option("--count", default=100000, help="追加する冊数")
+    @click.option("--batch", default=10000, help="1回のトランザクションで追加する冊数")
+    def seed_books_command(count, batch):
+        """負荷試験用の本を追加する（flask --app flaskpj seed-books --count 300000）。"""
+        books = generate_books(count)
+        for _ in range(0, count, batch):
+            add_books(itertools.islice(books, batch))
+        click.echo(f"added {count} books")
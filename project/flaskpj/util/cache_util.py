@@ -0,0 +1,210 @@
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, make_response, request
+
+from flaskpj.util.compress_util import response_encoding
+
+
+class MemoryBackend:
+    """プロセス内の LRU キャッシュ（ワーカーごとに別々）。"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (time.time() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class FileBackend:
+    """
+    ファイルに保存するキャッシュ。同じディレクトリを使う全ワーカーで共有される。
+    期限切れのファイルは sweep_interval 秒ごとにまとめて消し、max_entries を超えた分は期限の近いものから消す。
+    """
+
+    def __init__(self, directory, max_entries=1024, sweep_interval=60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".pickle")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        expires_at = time.time() + ttl
+        with open(tmp_path, "wb") as f:
+            pickle.dump((expires_at, value), f)
+        # 更新時刻を期限にしておくと、sweep はファイルを開かずに期限切れを見つけられる
+        os.utime(tmp_path, (expires_at, expires_at))
+        os.replace(tmp_path, path)
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep()
+        finally:
+            self._sweep_lock.release()
+
+    def sweep(self):
+        """
+        期限切れのファイルを消し、max_entries を超えた分は期限の近いものから消す。
+
+        :return: 消したファイルの数
+        """
+        now = time.time()
+        alive = []
+        expired = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pickle"):
+                continue
+            try:
+                expires_at = entry.stat().st_mtime
+            except OSError:
+                continue
+            if expires_at < now:
+                expired.append(entry.path)
+            else:
+                alive.append((expires_at, entry.path))
+        if len(alive) > self.max_entries:
+            alive.sort()
+            expired += [path for _, path in alive[:len(alive) - self.max_entries]]
+        removed = 0
+        for path in expired:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                # 他のワーカーが先に消した場合
+                pass
+        return removed
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                os.remove(os.path.join(self.directory, name))
+
+
+def init_app(app):
+    """設定（CACHE_BACKEND）に合わせてキャッシュを用意する。"""
+    if app.config["CACHE_BACKEND"] == "file":
+        backend = FileBackend(app.config["CACHE_DIR"], app.config["CACHE_MAXSIZE"],
+                              app.config["CACHE_SWEEP_INTERVAL"])
+    else:
+        backend = MemoryBackend(app.config["CACHE_MAXSIZE"])
+    app.extensions["flaskpj_cache"] = backend
+    app.extensions["flaskpj_cache_stats"] = {"hit": 0, "miss": 0, "not_modified": 0}
+
+
+def default_key():
+    return f"{request.endpoint}:{request.full_path}"
+
+
+def _respond(entry, ttl, stats):
+    body, status, headers, etag = entry
+    mimetype = headers["Content-Type"].split(";")[0].strip()
+    # 圧縮したレスポンスの ETag には圧縮方式がつく（compress_util を参照）。
+    # 304 にも、このリクエストで 200 を返した場合と同じ ETag をつける
+    encoding = response_encoding(len(body), mimetype)
+    sent_etag = f"{etag}-{encoding}" if encoding else etag
+    if request.if_none_match.contains(sent_etag):
+        stats["not_modified"] += 1
+        response = current_app.response_class(status=304)
+        response.set_etag(sent_etag)
+        if mimetype in current_app.config["COMPRESS_MIMETYPES"]:
+            response.vary.add("Accept-Encoding")
+    else:
+        response = current_app.response_class(body, status=status, headers=headers)
+        response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = ttl
+    return response
+
+
+def cached(ttl=60, key=None):
+    """
+    ビューの結果をキャッシュするデコレータ。GET だけをキャッシュし、ETag / 304 にも対応する。
+
+    @bp.route('/post/<int:post_id>')
+    @cached(ttl=300)
+    def show_post(post_id): ...
+
+    :param ttl: キャッシュする秒数
+    :param key: キャッシュのキーを返す関数（省略時はエンドポイントとクエリつきのパス）
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+            backend = current_app.extensions["flaskpj_cache"]
+            stats = current_app.extensions["flaskpj_cache_stats"]
+            cache_key = (key or default_key)()
+            entry = backend.get(cache_key)
+            if entry is not None:
+                stats["hit"] += 1
+                return _respond(entry, ttl, stats)
+            stats["miss"] += 1
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            headers = {"Content-Type": response.headers["Content-Type"]}
+            entry = (body, response.status_code, headers, hashlib.sha256(body).hexdigest()[:16])
+            backend.set(cache_key, entry, ttl)
+            return _respond(entry, ttl, stats)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,91 @@
+import gzip
+from collections import OrderedDict
+
+from flask import current_app, request
+
+try:
+    # pip install brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+# 対応している圧縮方式（ETag の末尾につける名前）
+ENCODINGS = ("br", "gzip")
+
+# 静的ファイルは同じ内容を何度も圧縮しないように、圧縮結果を覚えておく
+_STATIC_CACHE_SIZE = 128
+_static_cache = OrderedDict()
+
+
+def choose_encoding(accept_encoding):
+    """Accept-Encoding から使う圧縮方式を選ぶ。brotli があれば優先する。"""
+    accepted = {item.split(";")[0].strip() for item in accept_encoding.lower().split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def response_encoding(size, mimetype):
+    """
+    size バイト・mimetype のレスポンスを今のリクエストに返すときの圧縮方式（圧縮しない場合は None）。
+    304 を返すとき（cache_util）に、200 の場合と同じ ETag を選ぶのにも使う。
+    """
+    config = current_app.config
+    if mimetype not in config["COMPRESS_MIMETYPES"] or size < config["COMPRESS_MIN_SIZE"]:
+        return None
+    return choose_encoding(request.headers.get("Accept-Encoding", ""))
+
+
+def compress(data, encoding, level=6):
+    if encoding == "br":
+        # brotli の quality は 0〜11。gzip のレベル（1〜9）に近い値にする
+        return brotli.compress(data, quality=min(level + 2, 11))
+    return gzip.compress(data, compresslevel=level)
+
+
+def _compress_static(key, data, encoding, level):
+    if key in _static_cache:
+        _static_cache.move_to_end(key)
+        return _static_cache[key]
+    body = compress(data, encoding, level)
+    _static_cache[key] = body
+    if len(_static_cache) > _STATIC_CACHE_SIZE:
+        _static_cache.popitem(last=False)
+    return body
+
+
+def init_app(app):
+    """テキスト系のレスポンスを Accept-Encoding に合わせて gzip / brotli で圧縮する。"""
+
+    @app.after_request
+    def compress_response(response):
+        # stream_with_context などのストリーミングは圧縮しない（静的ファイルは除く）
+        streamed = response.is_streamed and not response.direct_passthrough
+        if (response.status_code != 200 or streamed
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in app.config["COMPRESS_MIMETYPES"]):
+            return response
+        response.vary.add("Accept-Encoding")
+        if choose_encoding(request.headers.get("Accept-Encoding", "")) is None:
+            return response
+        # 静的ファイルは send_file のままだと中身を読めないので読み込む
+        response.direct_passthrough = False
+        data = response.get_data()
+        encoding = response_encoding(len(data), response.mimetype)
+        if encoding is None:
+            return response
+        level = app.config["COMPRESS_LEVEL"]
+        if request.endpoint == "static":
+            key = (request.path, response.get_etag()[0], encoding)
+            body = _compress_static(key, data, encoding, level)
+        else:
+            body = compress(data, encoding, level)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        # 圧縮前と区別できるように ETag に圧縮方式をつける
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
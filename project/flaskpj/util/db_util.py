@@ -0,0 +1,81 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import current_app
+
+
+class ConnectionPool:
+    """
+    SQLite の接続を使い回すプール。接続は必要になったときに作り、最大 size 本まで持つ。
+    fork した後（gunicorn の preload_app）は親プロセスの接続を使わずに作り直す。
+    """
+
+    def __init__(self, path, size=8, timeout=10):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # 読み込みと書き込みが同時にできるように WAL にする
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            idle = self._idle
+            try:
+                return idle, idle.get_nowait()
+            except queue.Empty:
+                if self._created < self.size:
+                    self._created += 1
+                    return idle, self._connect()
+        # 上限まで使っているときは返されるのを待つ
+        return idle, idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        idle, conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE 〜 COMMIT（例外のときは ROLLBACK）で囲んだ接続を返す。"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+
+def init_app(app):
+    """設定（DATABASE）のデータベースの接続プールを作る。"""
+    os.makedirs(os.path.dirname(os.path.abspath(app.config["DATABASE"])), exist_ok=True)
+    app.extensions["flaskpj_db"] = ConnectionPool(app.config["DATABASE"], app.config["DB_POOL_SIZE"])
+
+
+def get_pool():
+    return current_app.extensions["flaskpj_db"]
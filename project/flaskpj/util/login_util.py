@@ -1,6 +1,106 @@
+import math
+import os
+import threading
+import time
+
+import click
+from flask import current_app, redirect, session, url_for
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from flaskpj.util import user_store
+from flaskpj.util.db_util import get_pool
+
+RATE_LIMIT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS login_attempts (
+    ip TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (ip, slot)
+);
+"""
+
+# パスワードのハッシュ計算（CPU を使う）を同時に行う数の上限。計算はリクエストのスレッドで行い、
+# そのリクエストは計算が終わるまで待つ（非同期にはならない）。同時に計算する数を CPU 数までにして、
+# ログインが集中しても残りのスレッドで他のリクエストを処理できるようにする
+_hash_slots = threading.BoundedSemaphore(os.cpu_count() or 1)
+# 存在しないユーザーでも同じ時間をかけるためのハッシュ（ユーザー名の有無を推測させない）
+_dummy_hashes = {}
+
+
+def hash_password(password, iterations=None):
+    """
+    パスワードを PBKDF2-SHA256 でハッシュにする。
+
+    :param iterations: 繰り返し回数（大きいほど遅く、総当たりに強い）。省略時は PASSWORD_HASH_ITERATIONS
+    """
+    iterations = iterations or current_app.config["PASSWORD_HASH_ITERATIONS"]
+    with _hash_slots:
+        return generate_password_hash(password, f"pbkdf2:sha256:{iterations}")
+
+
+def check_password(password_hash, password):
+    with _hash_slots:
+        return check_password_hash(password_hash, password)
+
+
+def _dummy_hash():
+    iterations = current_app.config["PASSWORD_HASH_ITERATIONS"]
+    if iterations not in _dummy_hashes:
+        _dummy_hashes[iterations] = hash_password("dummy-password", iterations)
+    return _dummy_hashes[iterations]
+
+
+def init_db(pool):
+    user_store.init_db(pool)
+    with pool.connection() as conn:
+        conn.executescript(RATE_LIMIT_SCHEMA)
+
+
+def is_rate_limited(ip):
+    """
+    ip からのログインの試行を数え、LOGIN_RATE_WINDOW 秒あたり LOGIN_RATE_LIMIT 回を超えたら True。
+    回数はデータベースに保存するので、全ワーカーで合計して数える。LOGIN_RATE_LIMIT が 0 の場合は制限しない。
+    """
+    limit = current_app.config["LOGIN_RATE_LIMIT"]
+    if not limit:
+        return False
+    window_seconds = current_app.config["LOGIN_RATE_WINDOW"]
+    slot = math.floor(time.time() / window_seconds)
+    with get_pool().connection() as conn:
+        count = conn.execute(
+            "INSERT INTO login_attempts (ip, slot, count) VALUES (?, ?, 1) "
+            "ON CONFLICT (ip, slot) DO UPDATE SET count = count + 1 RETURNING count",
+            (ip, slot)).fetchone()[0]
+        if count == 1:
+            # 新しい時間枠になったら古い記録を消す
+            conn.execute("DELETE FROM login_attempts WHERE slot < ?", (slot - 1,))
+    return count > limit
+
+
+def valid_login(username, password):
+    password_hash = user_store.get_password_hash(username)
+    if password_hash is None:
+        check_password(_dummy_hash(), password)
+        return False
+    return check_password(password_hash, password)
 
-def valid_login():
-    pass
 
 def log_user_in(username):
-    pass
\ No newline at end of file
+    current_app.session_interface.regenerate(session)
+    session["username"] = username
+    return redirect(url_for("main.index"))
+
+
+def log_user_out():
+    session.clear()
+    return redirect(url_for("main.login"))
+
+
+def register_commands(app):
+    @app.cli.command("add-user")
+    def add_user_command():
+        """ユーザーを追加する（flask --app flaskpj add-user）。"""
+        username = click.prompt("Username")
+        password = click.prompt("Password", hide_input=True, confirmation_prompt=True)
+        user_store.add_user(username, hash_password(password))
+        click.echo(f"added {username}")
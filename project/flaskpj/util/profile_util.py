@@ -0,0 +1,126 @@
+import cProfile
+import itertools
+import os
+import pstats
+import threading
+import time
+
+from flask import g, request
+
+try:
+    # pip install pyinstrument
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+    from pyinstrument.session import Session
+except ImportError:
+    Profiler = None
+
+
+class RouteProfiles:
+    """
+    エンドポイントごとの応答時間（全リクエスト）と、N 件に1件のプロファイルを集める。
+
+    :param every: 何件に1件プロファイルを取るか
+    :param profiler: "cprofile" または "pyinstrument"
+    """
+
+    def __init__(self, every, profiler="cprofile"):
+        if profiler == "pyinstrument" and Profiler is None:
+            raise RuntimeError("pyinstrument is not installed (pip install pyinstrument)")
+        self.every = every
+        self.profiler = profiler
+        self.durations = {}
+        self.profiles = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self):
+        g.profile_start = time.perf_counter()
+        if next(self._counter) % self.every:
+            return
+        if self.profiler == "pyinstrument":
+            profiler = Profiler(async_mode="disabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 別のスレッドで計測中（Python 3.12 以降）の場合はこのリクエストは取らない
+                return
+        g.profiler = profiler
+
+    def stop(self):
+        if "profile_start" not in g:
+            return
+        endpoint = request.endpoint or "unknown"
+        elapsed = time.perf_counter() - g.profile_start
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            if self.profiler == "pyinstrument":
+                profile = profiler.stop()
+            else:
+                profiler.disable()
+                profile = pstats.Stats(profiler)
+        with self._lock:
+            self.durations.setdefault(endpoint, []).append(elapsed)
+            if profiler is None:
+                return
+            previous = self.profiles.get(endpoint)
+            if previous is None:
+                self.profiles[endpoint] = profile
+            elif self.profiler == "pyinstrument":
+                self.profiles[endpoint] = Session.combine(previous, profile)
+            else:
+                previous.add(profile)
+
+    def slowest(self, top=3):
+        """プロファイルのあるエンドポイントを、応答時間の p95 が遅い順に返す。"""
+        def p95(endpoint):
+            values = sorted(self.durations[endpoint])
+            return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+        with self._lock:
+            endpoints = [endpoint for endpoint in self.profiles if endpoint in self.durations]
+        return sorted(endpoints, key=p95, reverse=True)[:top]
+
+    def dump(self, directory, top=3):
+        """
+        遅いエンドポイントのプロファイルを保存する。
+        cProfile は <endpoint>.prof（snakeviz / flameprof などで表示）、
+        pyinstrument は <endpoint>.speedscope.json（https://www.speedscope.app で表示）。
+
+        :return: 保存したファイルのリスト
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for endpoint in self.slowest(top):
+            profile = self.profiles[endpoint]
+            if self.profiler == "pyinstrument":
+                path = os.path.join(directory, f"{endpoint}.speedscope.json")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(SpeedscopeRenderer().render(profile))
+            else:
+                path = os.path.join(directory, f"{endpoint}.prof")
+                profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+def init_app(app):
+    """PROFILE_EVERY が 0 より大きいときだけ、リクエストの計測を有効にする。"""
+    every = app.config.get("PROFILE_EVERY", 0)
+    if not every:
+        return
+    profiles = RouteProfiles(every, app.config["PROFILER"])
+    app.extensions["flaskpj_profiles"] = profiles
+    app.before_request(profiles.start)
+    app.teardown_request(lambda exc: profiles.stop())
+
+
+def dump_profiles(app, directory=None, top=3):
+    """集めたプロファイルを PROFILE_DIR（gunicorn の場合はワーカーごとのディレクトリ）に保存する。"""
+    profiles = app.extensions.get("flaskpj_profiles")
+    if profiles is None:
+        return []
+    return profiles.dump(directory or os.path.join(app.config["PROFILE_DIR"], str(os.getpid())), top)
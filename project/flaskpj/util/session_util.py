@@ -0,0 +1,92 @@
+import json
+import secrets
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+"""
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SqliteSessionInterface(SessionInterface):
+    """
+    セッションの中身を SQLite に保存し、Cookie にはランダムな ID だけを入れる。
+    全ワーカーで同じデータベースを使うので、どのワーカーにリクエストが来ても同じセッションになる。
+    期限切れのセッションは evict_interval 秒ごとにまとめて消す。
+
+    :param ttl: セッションの有効期間（秒）。保存するたびに延びる
+    """
+
+    def __init__(self, pool, ttl=24 * 60 * 60, evict_interval=60):
+        self.pool = pool
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self._next_evict = 0
+        with pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _evict(self, conn, now):
+        if now >= self._next_evict:
+            self._next_evict = now + self.evict_interval
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            with self.pool.connection() as conn:
+                row = conn.execute("SELECT data FROM sessions WHERE id = ? AND expires_at >= ?",
+                                   (sid, time.time())).fetchone()
+            if row is not None:
+                return ServerSideSession(json.loads(row["data"]), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                with self.pool.connection() as conn:
+                    conn.execute("DELETE FROM sessions WHERE id = ?", (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                         (session.sid, json.dumps(dict(session)), now + self.ttl))
+            self._evict(conn, now)
+        response.set_cookie(name, session.sid, max_age=self.ttl, domain=domain, path=path,
+                            httponly=self.get_cookie_httponly(app), secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+    def regenerate(self, session):
+        """ログインしたときにセッション ID を作り直す（セッション固定攻撃の対策）。"""
+        if not session.new:
+            with self.pool.connection() as conn:
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session.sid,))
+        session.sid = secrets.token_urlsafe(32)
+        session.modified = True
+
+
+def init_app(app, pool):
+    app.session_interface = SqliteSessionInterface(pool, app.config["SESSION_TTL"])
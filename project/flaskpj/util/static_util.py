@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from flask import request
+
+# ファイルパス -> (更新時刻, ハッシュ)
+_hashes = {}
+
+
+def file_hash(path):
+    """ファイル内容のハッシュ（先頭12文字）。更新時刻が変わらない間は計算し直さない。"""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    _hashes[path] = (mtime, digest)
+    return digest
+
+
+def init_app(app):
+    """
+    url_for('static', filename=...) に ?v=<内容のハッシュ> をつけ、
+    ハッシュつきの URL には長期間のキャッシュヘッダーを返す。
+    ファイルを変えると URL も変わるので、ブラウザは新しいファイルを取りに来る。
+    """
+    if not app.config.get("STATIC_HASH_URLS"):
+        return
+
+    @app.url_defaults
+    def add_static_hash(endpoint, values):
+        if endpoint == "static" and "v" not in values and "filename" in values:
+            digest = file_hash(os.path.join(app.static_folder, values["filename"]))
+            if digest:
+                values["v"] = digest
+
+    @app.after_request
+    def cache_static(response):
+        if request.endpoint == "static" and request.args.get("v") and response.status_code == 200:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config["STATIC_MAX_AGE"]
+            response.cache_control.immutable = True
+        return response
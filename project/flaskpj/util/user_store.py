@@ -0,0 +1,37 @@
+import time
+
+from flaskpj.util.db_util import get_pool
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def init_db(pool):
+    # username の UNIQUE 制約でインデックスが作られるので、ログイン時の検索は1件を引くだけ
+    with pool.connection() as conn:
+        conn.executescript(SCHEMA)
+
+
+def add_user(username, password_hash, pool=None):
+    """ユーザーを追加する。既にいる場合は sqlite3.IntegrityError。"""
+    with (pool or get_pool()).connection() as conn:
+        conn.execute("INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                     (username, password_hash, time.time()))
+
+
+def set_password_hash(username, password_hash, pool=None):
+    with (pool or get_pool()).connection() as conn:
+        conn.execute("UPDATE users SET password_hash = ? WHERE username = ?", (password_hash, username))
+
+
+def get_password_hash(username, pool=None):
+    """ユーザーのパスワードハッシュ。いない場合は None。"""
+    with (pool or get_pool()).connection() as conn:
+        row = conn.execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
+    return row["password_hash"] if row else None
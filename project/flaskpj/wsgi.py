@@ -0,0 +1,6 @@
+# 本番用の WSGI エントリポイント（project ディレクトリで実行する）
+# pip install gunicorn
+# gunicorn -c flaskpj/gunicorn.conf.py flaskpj.wsgi:app
+from flaskpj import create_app
+
+app = create_app("production")
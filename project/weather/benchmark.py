@@ -0,0 +1,296 @@
+# 天気予報処理（エリア検索・取得・デコード・表作成・グラフ作成）のベンチマーク。
+# 気象庁APIの代わりに fixtures/ の JSON を返すローカルサーバーを使う。
+# weather ディレクトリで実行する。
+#
+# python benchmark.py                                   1, 10, 100 エリアで計測
+# python benchmark.py --scales 1,100,1000 --stages fetch,parse
+# python benchmark.py --save-baseline baseline.json     結果を保存
+# python benchmark.py --compare baseline.json           保存した結果と比較（遅くなったら終了コード 1）
+# python benchmark.py --record 130000 250000            実際のAPIから fixtures/ を取り直す
+#
+# --record で保存した forecast_<エリアコード>.json は、そのエリアの予報としてスタブサーバーが返す。
+# それ以外のエリアには forecast.json を返す。
+# render のピークメモリは、ワーカープロセスを使わずに1プロセスで描画して計測する
+# （ProcessPoolExecutor のワーカーは親プロセスの tracemalloc では計測できないため）。
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+STAGES = ("area", "fetch", "decode", "parse", "render")
+
+
+def load_fixtures(fixture_dir: str = FIXTURE_DIR):
+    """
+    :return: (area.json, 既定の予報, {エリアコード: --record で保存した予報})
+    """
+    with open(os.path.join(fixture_dir, "area.json"), encoding="utf-8") as f:
+        area = json.load(f)
+    with open(os.path.join(fixture_dir, "forecast.json"), "rb") as f:
+        forecast = f.read()
+    recorded = {}
+    for name in sorted(os.listdir(fixture_dir)):
+        if name.startswith("forecast_") and name.endswith(".json"):
+            with open(os.path.join(fixture_dir, name), "rb") as f:
+                recorded[name[len("forecast_"):-len(".json")]] = f.read()
+    return area, forecast, recorded
+
+
+def expand_area(area: dict, size: int) -> dict:
+    """offices が size 件になるまで架空のエリアを追加した area.json を作る。"""
+    offices = dict(area["offices"])
+    i = 0
+    while len(offices) < size:
+        offices[f"9{i:05d}"] = {"name": f"テスト{i}地方", "enName": f"Test {i}"}
+        i += 1
+    return {**area, "offices": offices}
+
+
+class StubJmaServer:
+    """
+    気象庁APIと同じパスで fixtures の JSON を返すローカルサーバー。
+    予報は recorded にあるエリアコードならその内容を、それ以外は forecast を返し、ETag による 304 にも対応する。
+    """
+
+    def __init__(self, area: dict, forecast: bytes, recorded: dict = None):
+        self.area = json.dumps(area, ensure_ascii=False).encode("utf-8")
+        self.forecast = forecast
+        self.recorded = recorded or {}
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                if self.path == "/bosai/common/const/area.json":
+                    body, etag = stub.area, '"area"'
+                elif self.path.startswith("/bosai/forecast/data/forecast/"):
+                    area_code = self.path.rsplit("/", 1)[-1].removesuffix(".json")
+                    if area_code in stub.recorded:
+                        body, etag = stub.recorded[area_code], f'"forecast-{area_code}"'
+                    else:
+                        body, etag = stub.forecast, '"forecast"'
+                else:
+                    self.send_error(404)
+                    return
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def measure(func, repeat: int = 3, memory: bool = True, memory_func=None):
+    """
+    func を repeat 回実行して最短時間を返す。memory=True の場合は
+    tracemalloc を有効にしてもう1回実行し、ピークメモリ（バイト）を返す。
+
+    :param memory_func: ピークメモリの計測に func の代わりに実行する関数
+    """
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            (memory_func or func)()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+# run() の間だけスタブサーバー用に書き換える weather_api のモジュール変数
+_PATCHED_GLOBALS = ("AREA_URL", "FORECAST_URL", "_area_offices", "_area_index", "_area_fetched_at",
+                    "_area_retry_at")
+
+
+@contextlib.contextmanager
+def _restore_weather_api(weather_api):
+    """ブロックを抜けるときに、URL・エリア表・予報キャッシュを元に戻す（同じプロセスで使い続けられるように）。"""
+    saved = {name: getattr(weather_api, name) for name in _PATCHED_GLOBALS}
+    with weather_api._forecast_lock:
+        saved_cache = dict(weather_api._forecast_cache)
+        saved_stats = dict(weather_api.forecast_cache_stats)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(weather_api, name, value)
+        with weather_api._forecast_lock:
+            weather_api._forecast_cache.clear()
+            weather_api._forecast_cache.update(saved_cache)
+            weather_api.forecast_cache_stats.update(saved_stats)
+
+
+def run(scales, stages, repeat: int = 3, memory: bool = True, fixture_dir: str = FIXTURE_DIR) -> dict:
+    import weather_api
+    import parse_weather_data
+    import plot_weather_forecast
+
+    area, forecast, recorded = load_fixtures(fixture_dir)
+    results = {}
+    with StubJmaServer(expand_area(area, max(scales)), forecast, recorded) as stub, \
+            tempfile.TemporaryDirectory() as tmp, _restore_weather_api(weather_api):
+        weather_api.AREA_URL = f"{stub.url}/bosai/common/const/area.json"
+        weather_api.FORECAST_URL = f"{stub.url}/bosai/forecast/data/forecast/{{area_code}}.json"
+        weather_api.refresh_area_cache(os.path.join(tmp, "area.json"))
+        codes = weather_api.get_office_codes()
+        names = [info["name"] for info in expand_area(area, max(scales))["offices"].values()]
+
+        for scale in scales:
+            target_codes = codes[:scale]
+            target_names = names[:scale]
+
+            def fetch():
+                weather_api.clear_forecast_cache()
+                return weather_api.get_weather_forecasts(target_codes)
+
+            forecasts = fetch()
+            with contextlib.redirect_stdout(io.StringIO()):
+                tables = {code: parse_weather_data.parse_weather_data(data, code)
+                          for code, data in forecasts.items()}
+            out_dir = os.path.join(tmp, f"charts-{scale}")
+
+            funcs = {
+                "area": lambda: [weather_api.get_area_code(name) for name in target_names],
+                "fetch": fetch,
+                # 本番と同じデコーダ（orjson があれば orjson）で計測する
+                "decode": lambda: [weather_api._json_loads(forecast) for _ in target_codes],
+                "parse": lambda: parse_weather_data.parse_weather_frames(forecasts),
+                "render": lambda: plot_weather_forecast.render_weather_graphs(tables, out_dir),
+            }
+            memory_funcs = {
+                # ワーカープロセスのメモリは計測できないので、同じプロセスで描画して計測する
+                "render": lambda: plot_weather_forecast.render_weather_graphs(tables, out_dir, processes=1),
+            }
+            for stage in stages:
+                # render は1回の実行が長いため繰り返さない
+                seconds, peak = measure(funcs[stage], 1 if stage == "render" else repeat, memory,
+                                        memory_funcs.get(stage))
+                results[f"{stage}@{scale}"] = {
+                    "seconds": seconds,
+                    "areas_per_sec": scale / seconds if seconds else None,
+                    "peak_kb": peak / 1024 if peak is not None else None,
+                }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """baseline より threshold（割合）以上遅くなった項目を返す。"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or not base["seconds"]:
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        result["vs_baseline"] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(key)
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"{'stage@scale':<16}{'seconds':>12}{'areas/s':>12}{'peak KB':>12}{'vs base':>10}")
+    for key, result in results.items():
+        per_sec = f"{result['areas_per_sec']:.1f}" if result["areas_per_sec"] else "-"
+        peak = f"{result['peak_kb']:.0f}" if result["peak_kb"] is not None else "-"
+        ratio = f"{result['vs_baseline']:.2f}x" if "vs_baseline" in result else "-"
+        print(f"{key:<16}{result['seconds']:>12.4f}{per_sec:>12}{peak:>12}{ratio:>10}")
+    if any(key.startswith("render@") and result["peak_kb"] is not None for key, result in results.items()):
+        print("render の peak KB はワーカーを使わず1プロセスで描画したときの値")
+
+
+def record(area_codes, fixture_dir: str = FIXTURE_DIR):
+    """実際の気象庁APIから area.json と予報（最初のエリアコード）を取得して保存する。"""
+    import weather_api
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    response = weather_api.session.get(weather_api.AREA_URL, timeout=weather_api.REQUEST_TIMEOUT)
+    response.raise_for_status()
+    with open(os.path.join(fixture_dir, "area.json"), "wb") as f:
+        f.write(response.content)
+    for area_code in area_codes:
+        url = weather_api.FORECAST_URL.format(area_code=area_code)
+        response = weather_api.session.get(url, timeout=weather_api.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        name = "forecast.json" if area_code == area_codes[0] else f"forecast_{area_code}.json"
+        with open(os.path.join(fixture_dir, name), "wb") as f:
+            f.write(response.content)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="天気予報処理のベンチマーク")
+    parser.add_argument("--scales", default="1,10,100", help="エリア数（カンマ区切り）")
+    parser.add_argument("--stages", default=",".join(STAGES), help="計測する処理（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="ピークメモリを計測しない")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.2, help="遅くなったと判定する割合")
+    parser.add_argument("--record", nargs="+", metavar="AREA_CODE")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record(args.record)
+        return 0
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    results = run(scales, stages, args.repeat, not args.no_memory)
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    print_results(results)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print(f"遅くなった項目: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# 天気予報ツールのコマンドライン。weather ディレクトリで実行する。
+#
+# python cli.py area 東京都              エリアコードを表示
+# python cli.py fetch 東京都             天気予報（JSON）を表示
+# python cli.py table 東京都 [--all]     週間気温予報の表を表示
+# python cli.py plot 東京都 [-o out.png] 週間気温予報のグラフを表示・保存
+#
+# pandas / matplotlib は table / plot のときだけ読み込む。
+# --profile-startup を付けると各モジュールの読み込み時間を表示する。
+import argparse
+import importlib
+import json
+import sys
+import time
+
+_started = time.perf_counter()
+_import_times = []
+
+
+def _import(name):
+    """モジュールを読み込み、かかった時間を記録する。"""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_times.append((name, time.perf_counter() - start))
+    return module
+
+
+def _area_code(weather_api, prefecture):
+    area_code = weather_api.get_area_code(prefecture)
+    if not area_code.isdigit():
+        raise SystemExit(area_code)
+    return area_code
+
+
+def _forecast(weather_api, prefecture):
+    weather_data = weather_api.get_weather_forecast(_area_code(weather_api, prefecture))
+    if not isinstance(weather_data, list):
+        raise SystemExit(weather_data)
+    return weather_data
+
+
+def cmd_area(args):
+    weather_api = _import("weather_api")
+    if args.all:
+        print("\n".join(weather_api.get_area_codes(args.prefecture)))
+    else:
+        print(_area_code(weather_api, args.prefecture))
+
+
+def cmd_fetch(args):
+    weather_api = _import("weather_api")
+    print(json.dumps(_forecast(weather_api, args.prefecture), indent=2, ensure_ascii=False))
+
+
+def cmd_table(args):
+    weather_api = _import("weather_api")
+    parse_weather_data = _import("parse_weather_data")
+    weather_data = _forecast(weather_api, args.prefecture)
+    if args.all:
+        print(parse_weather_data.parse_weather_frame(weather_data).to_string())
+    else:
+        print(parse_weather_data.parse_weather_data(weather_data, area_name=args.prefecture))
+
+
+def cmd_plot(args):
+    weather_api = _import("weather_api")
+    parse_weather_data = _import("parse_weather_data")
+    plot_weather_forecast = _import("plot_weather_forecast")
+    weather_data = _forecast(weather_api, args.prefecture)
+    df = parse_weather_data.parse_weather_data(weather_data, area_name=args.prefecture)
+    if df is None:
+        raise SystemExit("None")
+    if args.output:
+        plot_weather_forecast.WeatherGraphRenderer().render(df, args.prefecture, args.output)
+        print(args.output)
+    else:
+        plot_weather_forecast.show_weather_graph(df)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="気象庁の週間天気予報ツール")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="モジュールの読み込み時間を標準エラーに表示する")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    area = subparsers.add_parser("area", help="エリアコードを表示する")
+    area.add_argument("prefecture")
+    area.add_argument("--all", action="store_true", help="該当するエリアコードをすべて表示する")
+    area.set_defaults(func=cmd_area)
+
+    fetch = subparsers.add_parser("fetch", help="天気予報（JSON）を表示する")
+    fetch.add_argument("prefecture")
+    fetch.set_defaults(func=cmd_fetch)
+
+    table = subparsers.add_parser("table", help="週間気温予報の表を表示する")
+    table.add_argument("prefecture")
+    table.add_argument("--all", action="store_true", help="すべての予報項目・エリアを表示する")
+    table.set_defaults(func=cmd_table)
+
+    plot = subparsers.add_parser("plot", help="週間気温予報のグラフを表示する")
+    plot.add_argument("prefecture")
+    plot.add_argument("-o", "--output", help="画像の保存先（指定すると画面に表示しない）")
+    plot.set_defaults(func=cmd_plot)
+    return parser
+
+
+def _print_profile():
+    for name, seconds in _import_times:
+        print(f"import {name}: {seconds * 1000:.1f} ms", file=sys.stderr)
+    total = sum(seconds for _, seconds in _import_times)
+    print(f"imports: {total * 1000:.1f} ms", file=sys.stderr)
+    print(f"elapsed: {(time.perf_counter() - _started) * 1000:.1f} ms", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        if args.profile_startup:
+            _print_profile()
+
+
+if __name__ == "__main__":
+    main()
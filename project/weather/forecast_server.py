@@ -0,0 +1,145 @@
+# 週間気温予報を HTTP で提供する Flask アプリ。
+# weather ディレクトリで実行する: python forecast_server.py
+#
+# GET /forecast/<都道府県名>            週間気温予報の表（JSON）
+# GET /forecast/<都道府県名>/chart.png  週間気温予報のグラフ（PNG / .svg も可）
+# GET /stats                            キャッシュの統計
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from flask import Flask, Response, abort, jsonify
+
+import parse_weather_data
+import plot_weather_forecast
+import weather_api
+
+TABLE_CACHE_SIZE = 128
+CHART_CACHE_SIZE = 256
+CACHE_TTL = 10 * 60  # 秒
+
+
+class TTLCache:
+    """
+    件数上限（LRU）と有効期限つきのキャッシュ。
+    同じキーへの同時リクエストは最初の1件だけが計算し、残りはその結果を待つ。
+    計算結果が None の場合はキャッシュしない。
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hit": 0, "miss": 0, "coalesced": 0}
+
+    def get_or_compute(self, key, func):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and time.monotonic() - item[0] < self.ttl:
+                self._data.move_to_end(key)
+                self.stats["hit"] += 1
+                return item[1]
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                owner = False
+            else:
+                future = self._inflight[key] = Future()
+                self.stats["miss"] += 1
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            if value is not None:
+                with self._lock:
+                    self._data[key] = (time.monotonic(), value)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+app = Flask(__name__)
+table_cache = TTLCache(TABLE_CACHE_SIZE, CACHE_TTL)
+chart_cache = TTLCache(CHART_CACHE_SIZE, CACHE_TTL)
+
+# Figure は使い回すため、描画は1つずつ行う
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def _load_table(prefecture):
+    area_code = weather_api.get_area_code(prefecture)
+    if not area_code.isdigit():
+        return None
+    weather_data = weather_api.get_weather_forecast(area_code)
+    if not isinstance(weather_data, list):
+        return None
+    # parse_weather_data は timeSeries を print するので、サーバーでは使わない
+    return parse_weather_data.parse_weekly_temps(parse_weather_data.weekly_temps(weather_data))
+
+
+def get_table(prefecture):
+    return table_cache.get_or_compute(prefecture, lambda: _load_table(prefecture))
+
+
+def _render_chart(prefecture, fmt):
+    global _renderer
+    df = get_table(prefecture)
+    if df is None:
+        return None
+    buffer = io.BytesIO()
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = plot_weather_forecast.WeatherGraphRenderer()
+        _renderer.render(df, prefecture, buffer, fmt=fmt)
+    return buffer.getvalue()
+
+
+@app.route("/forecast/<prefecture>")
+def forecast_table(prefecture):
+    df = get_table(prefecture)
+    if df is None:
+        abort(404)
+    df = df.astype(object).where(df.notna(), None)
+    return jsonify(prefecture=prefecture, forecast=df.to_dict(orient="records"))
+
+
+@app.route("/forecast/<prefecture>/chart.<fmt>")
+def forecast_chart(prefecture, fmt):
+    if fmt not in ("png", "svg"):
+        abort(404)
+    image = chart_cache.get_or_compute((prefecture, fmt), lambda: _render_chart(prefecture, fmt))
+    if image is None:
+        abort(404)
+    mimetype = "image/png" if fmt == "png" else "image/svg+xml"
+    return Response(image, mimetype=mimetype)
+
+
+@app.route("/stats")
+def stats():
+    return jsonify(table=table_cache.stats, chart=chart_cache.stats,
+                   forecast=weather_api.get_forecast_cache_stats())
+
+
+if __name__ == "__main__":
+    app.run(threaded=True)
@@ -0,0 +1,198 @@
+# 取得した天気予報を Parquet 形式で蓄積し、過去の予報を検索するモジュール。
+# pip install pyarrow
+#
+# 保存先のディレクトリ構成（hive 形式のパーティション）
+# history/
+#     date=2025-02-26/
+#         office_code=130000/
+#             part-<uuid>-0.parquet
+#     ...
+#
+# 追記のたびにパーティションごとに小さなファイルが1つ増えるので、1日に1回程度
+# compact_history() を実行して、取得日・エリアごとに1ファイルにまとめる。
+import datetime
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+import parse_weather_data
+
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), "history")
+
+PARTITION_COLUMNS = ["date", "office_code"]
+CATEGORY_COLUMNS = ("area_name", "area_code", "office_code", "weatherCodes", "weathers",
+                    "winds", "waves", "reliabilities")
+
+# 予報項目はエリアによって有無が異なるため、スキーマを固定して書き込む
+SCHEMA = pa.schema(
+    [("time", pa.timestamp("us", tz="+09:00")),
+     ("fetched_at", pa.timestamp("us", tz="+09:00")),
+     ("report", pa.int8()),
+     ("series", pa.int8()),
+     ("area_name", pa.string()),
+     ("area_code", pa.string())]
+    + [(key, pa.string()) for key in ("weatherCodes", "weathers", "winds", "waves", "reliabilities")]
+    + [(key, pa.float32()) for key in parse_weather_data.NUMERIC_FIELDS]
+    + [("date", pa.string()), ("office_code", pa.string())]
+)
+# パーティションの列はディレクトリ名に入るので、ファイルには含まれない
+FILE_SCHEMA = pa.schema([field for field in SCHEMA if field.name not in PARTITION_COLUMNS])
+
+
+def _snapshot_table(df, office_code: str, fetched_at=None):
+    if fetched_at is None:
+        fetched_at = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9)))
+    fetched_at = pd.Timestamp(fetched_at)
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.tz_localize("+09:00")
+
+    df = df.reset_index()
+    df["fetched_at"] = fetched_at
+    df["date"] = fetched_at.strftime("%Y-%m-%d")
+    df["office_code"] = str(office_code)
+    for key in SCHEMA.names:
+        if key not in df.columns:
+            df[key] = None
+    for key in CATEGORY_COLUMNS:
+        df[key] = df[key].astype("string")
+    return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+
+def _write_tables(tables, path: str) -> int:
+    table = pa.concat_tables(tables)
+    ds.write_dataset(table, path, format="parquet",
+                     partitioning=PARTITION_COLUMNS, partitioning_flavor="hive",
+                     basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore")
+    return table.num_rows
+
+
+def append_snapshot(df, office_code: str, fetched_at=None, path: str = HISTORY_PATH) -> int:
+    """
+    parse_weather_frame の結果を1回分の取得結果として追記する。
+
+    :param df: parse_weather_frame の戻り値
+    :param office_code: 取得したエリアコード（例: "130000"）
+    :param fetched_at: 取得日時（既定: 現在時刻）
+    :return: 書き込んだ行数
+    """
+    return _write_tables([_snapshot_table(df, office_code, fetched_at)], path)
+
+
+def append_forecasts(weather_jsons: dict, fetched_at=None, path: str = HISTORY_PATH) -> int:
+    """
+    get_weather_forecasts の戻り値をまとめて追記する。
+    全エリアを1回の書き込みにまとめるので、パーティションごとに増えるファイルは1回につき1つになる。
+
+    :param weather_jsons: {エリアコード: 天気予報（JSON）}
+    :return: 書き込んだ行数
+    """
+    if fetched_at is None:
+        fetched_at = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9)))
+    tables = [_snapshot_table(parse_weather_data.parse_weather_frame(weather_json), office_code, fetched_at)
+              for office_code, weather_json in weather_jsons.items() if isinstance(weather_json, list)]
+    if not tables:
+        return 0
+    return _write_tables(tables, path)
+
+
+def compact_history(path: str = HISTORY_PATH, before=None) -> int:
+    """
+    取得日・エリアのパーティションごとに、追記で増えたファイルを1つにまとめる。
+    まとめたファイルは取得日時・予報時刻の順に並べるので、行グループの統計情報による絞り込みも効きやすくなる。
+
+    :param before: この日より前の取得日だけをまとめる（既定: 今日。追記中のパーティションは触らない）
+    :return: まとめたパーティションの数
+    """
+    if not os.path.isdir(path):
+        return 0
+    if before is None:
+        before = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=9)))
+    before = pd.Timestamp(before).strftime("%Y-%m-%d")
+
+    compacted = 0
+    for date_dir in sorted(os.listdir(path)):
+        if not date_dir.startswith("date=") or date_dir[len("date="):] >= before:
+            continue
+        for office_dir in sorted(os.listdir(os.path.join(path, date_dir))):
+            partition = os.path.join(path, date_dir, office_dir)
+            files = [os.path.join(partition, name) for name in sorted(os.listdir(partition))
+                     if name.endswith(".parquet") and not name.startswith(("_", "."))]
+            if len(files) <= 1:
+                continue
+            table = ds.dataset(files, schema=FILE_SCHEMA, format="parquet").to_table()
+            table = table.sort_by([("fetched_at", "ascending"), ("time", "ascending")])
+            # "_" で始まるファイルはデータセットの読み込みで無視されるので、書き終わってから名前を変える
+            name = f"part-{uuid.uuid4().hex}-0.parquet"
+            tmp_path = os.path.join(partition, f"_{name}")
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, os.path.join(partition, name))
+            for file in files:
+                os.remove(file)
+            compacted += 1
+    return compacted
+
+
+def _dataset(path: str):
+    # ローカルファイルはメモリマップで読み込む
+    filesystem = pafs.LocalFileSystem(use_mmap=True)
+    partitioning = ds.partitioning(
+        pa.schema([("date", pa.string()), ("office_code", pa.string())]), flavor="hive")
+    return ds.dataset(path, schema=SCHEMA, format="parquet",
+                      partitioning=partitioning, filesystem=filesystem)
+
+
+def query_history(office_codes=None, area_names=None, start=None, end=None,
+                  columns=None, path: str = HISTORY_PATH):
+    """
+    蓄積した予報を検索する。条件はパーティション（取得日・エリアコード）と
+    Parquet の統計情報で絞り込まれ、該当するファイル・行グループだけが読み込まれる。
+
+    :param office_codes: 取得エリアコードのリスト（例: ["130000"]）
+    :param area_names: 予報区・観測地点名のリスト（例: ["東京"]）
+    :param start: 取得日の開始（"2025-02-01" など、この日を含む）
+    :param end: 取得日の終了（この日を含む）
+    :param columns: 読み込む列（None の場合はすべて）
+    :return: DataFrame（index=time）。該当がない場合は空の DataFrame
+    """
+    if columns is not None and "time" not in columns:
+        columns = ["time"] + list(columns)
+
+    conditions = []
+    if office_codes is not None:
+        conditions.append(ds.field("office_code").isin([str(code) for code in office_codes]))
+    if area_names is not None:
+        conditions.append(ds.field("area_name").isin(list(area_names)))
+    if start is not None:
+        conditions.append(ds.field("date") >= pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if end is not None:
+        conditions.append(ds.field("date") <= pd.Timestamp(end).strftime("%Y-%m-%d"))
+    condition = None
+    for item in conditions:
+        condition = item if condition is None else condition & item
+
+    if os.path.isdir(path):
+        table = _dataset(path).to_table(columns=columns, filter=condition)
+    else:
+        # まだ何も保存していない場合も、同じ列・型の空の DataFrame を返す
+        table = SCHEMA.empty_table().select(columns or SCHEMA.names)
+    df = table.to_pandas()
+    for key in CATEGORY_COLUMNS:
+        if key in df.columns:
+            df[key] = df[key].astype("category")
+    return df.set_index("time")
+
+
+if __name__ == "__main__":
+    import weather_api
+
+    tokyo_code = weather_api.get_area_code("東京都")
+    rows = append_forecasts(weather_api.get_weather_forecasts([tokyo_code]))
+    print(f"{rows} 行を保存しました")
+    print(f"{compact_history()} 個のパーティションをまとめました")
+    print(query_history(area_names=["東京"], columns=["fetched_at", "tempsMin", "tempsMax"]))
@@ -4,30 +4,29 @@
 
 # 必要に応じて都道府県名をユーザに入力させたり、エラーハンドリングを加えてもよい。
 import weather_api
-import parse_weather_data
-import plot_weather_forecast
 import json
 import logging
 
-def main():
-    
+def main(prefectures=("滋賀県",)):
+    # pandas / matplotlib は必要になってから読み込む（python cli.py も参照）
+    import parse_weather_data
+    import plot_weather_forecast
+
     # prefecture = input("都道府県名を入力してください: ").strip()
-    prefecture="滋賀県"
-    area_code=weather_api.get_area_code(prefecture)
-    if area_code is not None:
-        print(area_code)
-        if area_code.isdigit():
-            weather_data = weather_api.get_weather_forecast(area_code)
-            print(json.dumps(weather_data, indent=2, ensure_ascii=False))
+    # 複数の都道府県は並行して取得する
+    forecasts = weather_api.get_prefecture_forecasts(prefectures)
+    for prefecture, weather_data in forecasts.items():
+        if not isinstance(weather_data, list):
+            logging.error(weather_data)
+            continue
+        print(json.dumps(weather_data, indent=2, ensure_ascii=False))
 
+        df=parse_weather_data.parse_weather_data(weather_data,area_name=prefecture)
+        if df is not None:
+            plot_weather_forecast.show_weather_graph(df)
+        else:
+            logging.error("None")
 
-       
-            df=parse_weather_data.parse_weather_data(weather_data,area_name=prefecture)
-            if df is not None:
-                   plot_weather_forecast.show_weather_graph(df)      
-            else:
-               logging.error("None")
-               
 
 if __name__ == '__main__':
     main()
@@ -90,6 +90,130 @@ def parse_weather_data_new(weather_json,area_name):
         return df
     else:
         return None
+
+
+def weekly_temps(weather_json):
+    """
+    取得済みの天気予報（JSON）から週間気温予報を weather_api.stream_weekly_temps と同じ形で取り出す。
+    parse_weather_data と違って print しないので、サーバーなどではこちらと parse_weekly_temps を使う。
+    """
+    for series in weather_json[1]['timeSeries']:
+        for area in series.get('areas', []):
+            if 'tempsMin' in area or 'tempsMax' in area:
+                yield {
+                    'area': area['area'],
+                    'timeDefines': series['timeDefines'],
+                    'tempsMin': area.get('tempsMin', []),
+                    'tempsMax': area.get('tempsMax', []),
+                }
+
+
+def parse_weekly_temps(weekly_temps, area_name=None):
+    """
+    weather_api.stream_weekly_temps の結果から parse_weather_data と同じ形の表を作る。
+    最初に見つかったエリア（area_name を指定した場合はその名前のエリア）を使う。
+    """
+    tokyo_data = next((temps for temps in weekly_temps
+                       if area_name is None or temps['area']['name'] == area_name), None)
+    if tokyo_data is None:
+        return None
+    df = pd.DataFrame({
+        '日付': tokyo_data['timeDefines'],
+        '最高気温(℃)': tokyo_data['tempsMax'],
+        '最低気温(℃)': tokyo_data['tempsMin'],
+    })
+    return df.replace('', None)
+
+
+# 数値として扱う項目（それ以外の weathers, winds, weatherCodes などはカテゴリ型）
+NUMERIC_FIELDS = ("pops", "temps", "tempsMin", "tempsMinUpper", "tempsMinLower",
+                  "tempsMax", "tempsMaxUpper", "tempsMaxLower")
+
+
+def _collect_rows(weather_json, columns, fields, size, area_names=None):
+    """
+    天気予報（JSON）の各 timeSeries を列ごとのリストに追加する。
+
+    :return: 追加後の行数
+    """
+    for report_no, report in enumerate(weather_json):
+        for series_no, series in enumerate(report["timeSeries"]):
+            times = series["timeDefines"]
+            count = len(times)
+            for area in series["areas"]:
+                name = area["area"]["name"]
+                if area_names is not None and name not in area_names:
+                    continue
+                columns["report"] += [report_no] * count
+                columns["series"] += [series_no] * count
+                columns["area_name"] += [name] * count
+                columns["area_code"] += [area["area"]["code"]] * count
+                columns["time"] += times
+                for key, values in area.items():
+                    if key == "area":
+                        continue
+                    column = fields.setdefault(key, [None] * size)
+                    column += values[:count] + [None] * (count - len(values))
+                size += count
+                for column in fields.values():
+                    if len(column) < size:
+                        column += [None] * (size - len(column))
+    return size
+
+
+def _to_frame(columns, fields):
+    df = pd.DataFrame({**columns, **fields})
+    for key in df.columns:
+        if key in NUMERIC_FIELDS:
+            df[key] = pd.to_numeric(df[key], errors="coerce").astype("float32")
+        elif key in ("report", "series"):
+            df[key] = df[key].astype("int8")
+        elif key != "time":
+            df[key] = df[key].astype("category")
+    df["time"] = pd.to_datetime(df["time"])
+    return df.set_index("time")
+
+
+def parse_weather_frame(weather_json, area_names=None):
+    """
+    天気予報（JSON）のすべての timeSeries・すべてのエリアを1つの縦長 DataFrame に変換する。
+    行の組み立てはリストの連結だけで行い、型変換は列ごとにまとめて実行する。
+
+    :param weather_json: get_weather_forecast の戻り値
+    :param area_names: 対象のエリア名（None の場合はすべて）
+    :return: index=time（タイムゾーン付き）, 列=report, series, area_name, area_code と各予報項目
+             数値項目は float32（欠損は NaN）、文字列項目は category
+    """
+    columns = {"report": [], "series": [], "area_name": [], "area_code": [], "time": []}
+    fields = {}
+    _collect_rows(weather_json, columns, fields, 0, area_names)
+    return _to_frame(columns, fields)
+
+
+def parse_weather_frames(weather_jsons: dict):
+    """
+    複数エリアの天気予報（get_weather_forecasts の戻り値）を1つの DataFrame にまとめる。
+    すべての予報を列ごとのリストに集めてから、型変換を1回だけ行う。
+
+    :param weather_jsons: {エリアコード: 天気予報（JSON）}
+    :return: parse_weather_frame の結果に office_code 列を加えたもの
+    """
+    columns = {"report": [], "series": [], "area_name": [], "area_code": [], "time": []}
+    fields = {}
+    office_codes = []
+    size = 0
+    for office_code, weather_json in weather_jsons.items():
+        if not isinstance(weather_json, list):
+            continue
+        new_size = _collect_rows(weather_json, columns, fields, size)
+        office_codes += [office_code] * (new_size - size)
+        size = new_size
+    if size == 0:
+        return None
+    columns["office_code"] = office_codes
+    return _to_frame(columns, fields)
+
+
 if __name__ == "__main__":
     area_name="東京都"
     tokyo_code = weather_api.get_area_code("東京都")
@@ -11,14 +11,19 @@
 # 縦軸：温度、横軸：日付
 # グラフ種別：折れ線グラフ
 # 最高気温：赤 最低気温：青
-import matplotlib.pyplot as plt
+import os
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+import pandas as pd
 import parse_weather_data as parse_weather_data
 import weather_api as weather_api
 
 def show_weather_graph(df):
-  
-    df['最高気温(℃)'].fillna(0, inplace=True)
-    df['最低気温(℃)'].fillna(0, inplace=True)
+    # 画面表示のときだけ pyplot（GUI バックエンド）を読み込む
+    import matplotlib.pyplot as plt
+
+    # 呼び出し元の DataFrame は変更しない
+    df = df.fillna({'最高気温(℃)': 0, '最低気温(℃)': 0})
     print(df)
 
     # 折れ線グラフ作成
@@ -36,6 +41,67 @@ def show_weather_graph(df):
     plt.grid(True)
     plt.show()
 
+
+class WeatherGraphRenderer:
+    """
+    画面を使わずに（pyplot を経由しない Figure で）グラフをファイルへ出力するクラス。
+    Figure と折れ線は1回だけ作成し、エリアごとに線のデータだけを差し替えて再利用する。
+    """
+
+    def __init__(self, figsize=(10, 5)):
+        self.fig = Figure(figsize=figsize)
+        self.ax = self.fig.subplots()
+        self.max_line, = self.ax.plot([], [], marker='o', color='red', label='最高気温')
+        self.min_line, = self.ax.plot([], [], marker='*', color='blue', label='最低気温')
+        self.ax.set_xlabel('日付')
+        self.ax.set_ylabel('温度 (°C)')
+        self.ax.grid(True)
+        self.ax.legend()
+
+    def render(self, df, area_name, file_path, fmt=None):
+        dates = pd.to_datetime(df['日付'])
+        # 空の線で作成した軸には日付の単位が設定されないので、データを入れる前に設定する
+        # （設定しないと目盛りが日付ではなく数値になる）
+        self.ax.xaxis.update_units(dates)
+        self.max_line.set_data(dates, pd.to_numeric(df['最高気温(℃)'], errors='coerce'))
+        self.min_line.set_data(dates, pd.to_numeric(df['最低気温(℃)'], errors='coerce'))
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.ax.set_title(f'{area_name}の週間気温予報のグラフ')
+        self.fig.savefig(file_path, format=fmt)
+        return file_path
+
+
+def _render_chunk(items, out_dir, fmt):
+    renderer = WeatherGraphRenderer()
+    return [renderer.render(df, area_name, os.path.join(out_dir, f"{area_name}.{fmt}"))
+            for area_name, df in items]
+
+
+def render_weather_graphs(frames: dict, out_dir: str, fmt: str = "png", processes: int = None) -> list:
+    """
+    複数エリアのグラフをまとめてファイルに出力する関数。
+    エリアをプロセス数に分割し、各プロセスでは1つの Figure を使い回して描画する。
+
+    :param frames: {エリア名: parse_weather_data の戻り値}
+    :param out_dir: 出力先ディレクトリ
+    :param fmt: 画像形式（"png" または "svg"）
+    :param processes: プロセス数（既定: CPU数）。1 の場合は同じプロセスで描画する
+    :return: 出力したファイルパスのリスト
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    items = [(area_name, df) for area_name, df in frames.items() if df is not None]
+    processes = min(processes or os.cpu_count() or 1, len(items)) or 1
+    if processes == 1:
+        return _render_chunk(items, out_dir, fmt)
+
+    chunks = [items[i::processes] for i in range(processes)]
+    paths = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for result in executor.map(_render_chunk, chunks, [out_dir] * processes, [fmt] * processes):
+            paths.extend(result)
+    return paths
+
 if __name__ == "__main__":
     area_name="東京都"
     tokyo_code = weather_api.get_area_code("東京都")
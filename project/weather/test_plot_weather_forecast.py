@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+
+# weather のモジュールは同じディレクトリのモジュールを直接 import するので、このディレクトリをパスに加える
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parse_weather_data
+from plot_weather_forecast import WeatherGraphRenderer
+
+FORECAST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "forecast.json")
+
+
+class TestWeatherGraphRenderer(unittest.TestCase):
+    def setUp(self):
+        with open(FORECAST_PATH, encoding="utf-8") as f:
+            self.df = parse_weather_data.parse_weather_data(json.load(f), "東京")
+        self.tmp = tempfile.TemporaryDirectory()
+        # 環境に日本語フォントがない場合の警告は無視する
+        warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def tick_labels(self, renderer):
+        renderer.fig.canvas.draw()
+        return [label.get_text() for label in renderer.ax.get_xticklabels()]
+
+    def test_date_ticks(self):
+        renderer = WeatherGraphRenderer()
+        renderer.render(self.df, "東京", os.path.join(self.tmp.name, "tokyo.png"))
+        labels = self.tick_labels(renderer)
+        self.assertTrue(labels)
+        self.assertIn("2025-03-01", labels)
+        for label in labels:
+            self.assertRegex(label, r"^\d{4}-\d{2}-\d{2}$")
+
+    def test_date_ticks_after_reuse(self):
+        renderer = WeatherGraphRenderer()
+        renderer.render(self.df, "東京", os.path.join(self.tmp.name, "first.png"))
+        renderer.render(self.df, "東京", os.path.join(self.tmp.name, "second.svg"))
+        self.assertIn("2025-03-04", self.tick_labels(renderer))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "second.svg")))
+
+
+if __name__ == "__main__":
+    unittest.main()
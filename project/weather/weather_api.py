@@ -1,49 +1,361 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 import json
+import os
+import threading
+import time
+
+# 大きな JSON を逐次的に読むときに使う（pip install ijson）
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# orjson があれば JSON のデコードに使う（pip install orjson）
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+AREA_URL = "https://www.jma.go.jp/bosai/common/const/area.json"
+
+# エリア表（area.json の offices）のディスクキャッシュ
+AREA_CACHE_PATH = os.path.join(os.path.dirname(__file__), "cache", "area.json")
+AREA_CACHE_TTL = 24 * 60 * 60  # 秒
+# 期限切れの後に取得し直せなかった場合、古いインデックスを使いながら次に取得を試すまでの間隔
+AREA_RETRY_INTERVAL = 5 * 60  # 秒
+# True にすると area.json を ijson で逐次的に読む（load_area_index の既定値）
+AREA_CACHE_STREAM = False
+
+# プロセス内のインデックス（名前の部分文字列 -> エリアコードのリスト）。期限が切れたら作り直す
+_area_offices = None
+_area_index = None
+_area_fetched_at = 0.0
+_area_retry_at = 0.0
+_area_lock = threading.Lock()
+
+FORECAST_URL = "https://www.jma.go.jp/bosai/forecast/data/forecast/{area_code}.json"
+FORECAST_MAX_AGE = 60  # 秒
+
+# 予報キャッシュ（エリアコード -> 本文と検証用ヘッダ）
+_forecast_cache = {}
+_forecast_lock = threading.Lock()
+forecast_cache_stats = {"hit": 0, "miss": 0, "revalidated": 0}
+
+REQUEST_TIMEOUT = 10  # 秒
+# 同時に実行するリクエスト数の上限（共有セッションの接続プールの大きさ）
+MAX_WORKERS = 8
+
+
+def _create_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """
+    keep-alive の接続プールとリトライ（指数バックオフ）を設定したセッションを作成する。
+    """
+    retry = Retry(total=3, backoff_factor=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# 全リクエストで共有するセッション
+session = _create_session()
+
+
+def _build_area_index(offices: dict) -> dict:
+    """
+    offices から名前・英語名の部分文字列をキーにしたインデックスを作成する。
+    元の「prefecture_name in name」の判定と同じ結果を O(1) で引けるようにする。
+
+    :param offices: area.json の "offices"
+    :return: {"東京": ["130000"], "沖縄": ["471000", "472000", ...], ...}
+    """
+    index = {}
+    for code, info in offices.items():
+        for name in (info.get("name", ""), info.get("enName", "").lower()):
+            keys = {name[i:j] for i in range(len(name)) for j in range(i + 1, len(name) + 1)}
+            for key in keys:
+                index.setdefault(key, []).append(code)
+    return index
+
+
+def _read_area_cache(path: str, ttl: float):
+    """
+    ディスクキャッシュを読み込む。存在しない・期限切れの場合は None を返す。
+
+    :param ttl: 有効期限（秒）。None の場合は期限を無視する
+    :return: (offices, 取得した時刻)
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    fetched_at = cache.get("fetched_at", 0)
+    if ttl is not None and time.time() - fetched_at > ttl:
+        return None
+    return cache.get("offices"), fetched_at
+
+
+def _write_area_cache(path: str, offices: dict, fetched_at: float):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": fetched_at, "offices": offices}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _require_ijson():
+    if ijson is None:
+        raise ImportError("ストリーミングには ijson が必要です: pip install ijson")
+
+
+def _stream_offices(response) -> dict:
+    """
+    レスポンスを逐次的に読み、offices の名前と英語名だけを取り出す。
+    centers や class10s など使わない部分は dict にならない。
+    """
+    response.raw.decode_content = True
+    offices = {}
+    for code, info in ijson.kvitems(response.raw, "offices"):
+        offices[code] = {"name": info.get("name", ""), "enName": info.get("enName", "")}
+    return offices
+
+
+def refresh_area_cache(path: str = AREA_CACHE_PATH, stream: bool = False) -> dict:
+    """
+    気象庁APIから area.json を取得し直し、ディスクキャッシュとインデックスを更新する。
+
+    :param stream: True の場合は ijson で逐次的に読み、offices の必要な項目だけを保持する
+    :return: 更新後のインデックス
+    """
+    if stream:
+        _require_ijson()
+    with session.get(AREA_URL, timeout=REQUEST_TIMEOUT, stream=stream) as response:
+        response.raise_for_status()
+        if stream:
+            offices = _stream_offices(response)
+        else:
+            offices = _json_loads(response.content).get("offices", {})
+    fetched_at = time.time()
+    try:
+        _write_area_cache(path, offices, fetched_at)
+    except OSError:
+        # キャッシュを書き込めなくても、取得したエリア表はメモリ上で使える
+        pass
+    return _set_area_offices(offices, fetched_at)
+
+
+def _set_area_offices(offices: dict, fetched_at: float) -> dict:
+    global _area_offices, _area_index, _area_fetched_at
+    index = _build_area_index(offices)
+    with _area_lock:
+        _area_offices = offices
+        _area_index = index
+        _area_fetched_at = fetched_at
+    return index
+
+
+def load_area_index(path: str = AREA_CACHE_PATH, ttl: float = AREA_CACHE_TTL, stream: bool = None) -> dict:
+    """
+    エリアインデックスを取得する。メモリ上のインデックスが ttl 以内に取得したものならそれを返し、
+    期限切れの場合はディスクキャッシュまたはAPIから読み込み直す。
+    APIの取得に失敗した場合は期限切れのインデックス・キャッシュでも利用する。
+
+    :param ttl: 有効期限（秒）。None の場合は期限を無視する
+    :param stream: APIから取得するときに ijson で逐次的に読むか（既定: AREA_CACHE_STREAM）
+    """
+    global _area_retry_at
+    stream = AREA_CACHE_STREAM if stream is None else stream
+    now = time.time()
+    if _area_index is not None and (ttl is None or now - _area_fetched_at <= ttl or now < _area_retry_at):
+        return _area_index
+    cached = _read_area_cache(path, ttl)
+    if cached is not None:
+        return _set_area_offices(*cached)
+    try:
+        return refresh_area_cache(path, stream)
+    except requests.RequestException:
+        if _area_index is not None:
+            # 長時間動くプロセスでは、取得できるまで古いインデックスを使い続ける
+            with _area_lock:
+                _area_retry_at = time.time() + AREA_RETRY_INTERVAL
+            return _area_index
+        cached = _read_area_cache(path, None)
+        if cached is None:
+            raise
+        return _set_area_offices(*cached)
+
+
+def get_office_codes() -> list:
+    """
+    area.json の offices（都府県・地方予報区）のエリアコードをすべて取得する。
+    """
+    load_area_index()
+    return list(_area_offices)
+
+
+def get_area_codes(prefecture_name: str) -> list:
+    """
+    名前（部分一致）に該当するエリアコードをすべて取得する。
+
+    :param prefecture_name: 都道府県名・地方名の一部（例: "沖縄"）
+    :return: エリアコードのリスト（例: ["471000", "472000", "473000", "474000"]）
+    """
+    index = load_area_index()
+    return list(index.get(prefecture_name) or index.get(prefecture_name.lower(), []))
+
 
 def get_area_code(prefecture_name: str) -> str:
     """
     気象庁APIから都道府県名に対応するエリアコードを取得する関数。
-    
+
     :param prefecture_name: 都道府県名（例: "東京都"）
     :return: エリアコード（例: "130000"）
     """
-    url = "https://www.jma.go.jp/bosai/common/const/area.json"
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        # for code,item in data.items():
-        #     for code, info in item.items():
-        #         print(info)
-        #         if prefecture_name in info.get("name"):
-        #             return code
-        offices=  data.get("offices","{}")
-        for code, info in offices.items():
-            if prefecture_name in info.get("name"):
-                return code
-
-            
+        codes = get_area_codes(prefecture_name)
+        if codes:
+            return codes[0]
         return "該当する都道府県が見つかりません"
     except requests.RequestException as e:
         return f"エラーが発生しました: {e}"
 
-def get_weather_forecast(area_code:str)->dict:
-    url=f"https://www.jma.go.jp/bosai/forecast/data/forecast/{area_code}.json"
+
+def get_weather_forecast(area_code: str, max_age: float = None) -> dict:
+    """
+    週間天気予報を取得する関数。
+    取得した本文を ETag / Last-Modified と一緒にキャッシュし、2回目以降は
+    If-None-Match / If-Modified-Since を送って 304 の場合はキャッシュを返す。
+
+    :param area_code: エリアコード（例: "130000"）
+    :param max_age: この秒数以内に取得済みなら通信せずキャッシュを返す（既定: FORECAST_MAX_AGE）
+    :return: 天気予報（JSON）
+    """
+    url = FORECAST_URL.format(area_code=area_code)
+    max_age = FORECAST_MAX_AGE if max_age is None else max_age
+
+    with _forecast_lock:
+        entry = _forecast_cache.get(area_code)
+    if entry is not None and time.time() - entry["checked_at"] < max_age:
+        _count_forecast("hit")
+        return entry["body"]
+
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
 
     try:
-        response =requests.get(url)
+        response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and entry is not None:
+            _count_forecast("revalidated")
+            with _forecast_lock:
+                entry["checked_at"] = time.time()
+            return entry["body"]
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        body = _json_loads(response.content)
+    except (requests.RequestException, ValueError) as e:
+        # 通信エラーと同じく、途中で切れた・壊れた本文（orjson / json の ValueError）でもキャッシュを返す
+        if entry is not None:
+            return entry["body"]
         return f"error:{e}"
 
+    _count_forecast("miss")
+    with _forecast_lock:
+        _forecast_cache[area_code] = {
+            "body": body,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked_at": time.time(),
+        }
+    return body
+
+
+def get_weather_forecasts(area_codes, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    複数エリアの週間天気予報をスレッドプールで並行して取得する関数。
+    接続は共有セッションの keep-alive プールを再利用する。
+
+    :param area_codes: エリアコードのリスト（例: ["130000", "250000"]）
+    :param max_workers: 同時に実行するリクエスト数の上限（MAX_WORKERS より大きい値は MAX_WORKERS にする）
+    :return: {エリアコード: 天気予報（JSON）}
+    """
+    area_codes = list(dict.fromkeys(area_codes))
+    # 接続プールより多く同時に送ると、溢れた接続は使い回されずに閉じられる（"Connection pool is full"）
+    max_workers = max(1, min(max_workers, MAX_WORKERS))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        forecasts = executor.map(get_weather_forecast, area_codes)
+        return dict(zip(area_codes, forecasts))
+
+
+def get_prefecture_forecasts(prefecture_names, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    都道府県名のリストから週間天気予報をまとめて取得する関数。
+
+    :param prefecture_names: 都道府県名のリスト（例: ["東京都", "滋賀県"]）
+    :return: {都道府県名: 天気予報（JSON）}。見つからない場合はエラーメッセージ
+    """
+    codes = {name: get_area_code(name) for name in prefecture_names}
+    forecasts = get_weather_forecasts([code for code in codes.values() if code.isdigit()], max_workers)
+    return {name: forecasts.get(code, code) for name, code in codes.items()}
+
+
+def stream_weekly_temps(area_code: str):
+    """
+    週間気温予報（timeDefines / tempsMin / tempsMax）だけを逐次的に取り出すジェネレータ。
+    レスポンス全体を dict にせず、timeSeries を1つ読むごとに結果を返す。
+    予報キャッシュ（get_weather_forecast）は使わない。
+
+    :param area_code: エリアコード（例: "130000"）
+    :return: {"area": {"name": ..., "code": ...}, "timeDefines": [...], "tempsMin": [...], "tempsMax": [...]} を順に返す
+    """
+    _require_ijson()
+    url = FORECAST_URL.format(area_code=area_code)
+    with session.get(url, timeout=REQUEST_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        for series in ijson.items(response.raw, "item.timeSeries.item"):
+            for area in series.get("areas", []):
+                if "tempsMin" in area or "tempsMax" in area:
+                    yield {
+                        "area": area["area"],
+                        "timeDefines": series["timeDefines"],
+                        "tempsMin": area.get("tempsMin", []),
+                        "tempsMax": area.get("tempsMax", []),
+                    }
+
+
+def _count_forecast(key: str):
+    with _forecast_lock:
+        forecast_cache_stats[key] += 1
+
+
+def get_forecast_cache_stats() -> dict:
+    """予報キャッシュのヒット・ミス・再検証(304)の回数を返す。"""
+    with _forecast_lock:
+        return dict(forecast_cache_stats)
+
+
+def clear_forecast_cache():
+    """予報キャッシュとカウンタを初期化する。"""
+    with _forecast_lock:
+        _forecast_cache.clear()
+        for key in forecast_cache_stats:
+            forecast_cache_stats[key] = 0
+
+
 if __name__ == "__main__":
     tokyo_code = get_area_code("沖縄")
     print(f"東京都のエリアコード: {tokyo_code}")
-    
+
     if tokyo_code.isdigit():
         tokyo_weather = get_weather_forecast(tokyo_code)
         print(json.dumps(tokyo_weather, indent=2, ensure_ascii=False))